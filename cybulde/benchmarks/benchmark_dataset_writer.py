@@ -0,0 +1,49 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from cybulde.data_processing.dataset_writers import ParquetDatasetWriter
+from cybulde.utils.io_utils import make_dirs
+
+
+def get_synthetic_split_dfs(nrof_rows: int, seed: int = 1234) -> dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"word{idx}" for idx in range(5_000)])
+    nrof_words = rng.integers(2, 40, size=nrof_rows)
+    texts = [" ".join(rng.choice(vocabulary, size=size)) for size in nrof_words]
+    df = pd.DataFrame(
+        {
+            "text": texts,
+            "label": rng.integers(0, 2, size=nrof_rows),
+            "split": rng.choice(["train", "dev", "test"], size=nrof_rows, p=[0.8, 0.1, 0.1]),
+            "dataset_name": rng.choice(["ghc", "jtc", "twt"], size=nrof_rows),
+            "cleaned_text": texts,
+            "nrof_words": nrof_words,
+        }
+    )
+    return {split_name: df[df["split"] == split_name] for split_name in ["train", "dev", "test"]}
+
+
+def benchmark_dataset_writer(args: argparse.Namespace) -> None:
+    split_dfs = get_synthetic_split_dfs(args.nrof_rows)
+    make_dirs(args.save_dir)
+    for max_workers in args.max_workers:
+        dataset_writer = ParquetDatasetWriter(max_workers=max_workers, upload_block_size=args.upload_block_size)
+        start_time = time.perf_counter()
+        dataset_writer.write_splits(split_dfs, args.save_dir, yaml_files={"docker_info.yaml": {"docker_tag": "bench"}})
+        print(f"max_workers={max_workers}: {time.perf_counter() - start_time:.3f}s")
+
+
+def benchmark_args_parser() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--save-dir", type=str, default="memory://benchmark/processed", help="fsspec output directory")
+    parser.add_argument("--nrof-rows", type=int, default=200_000, help="Number of synthetic rows")
+    parser.add_argument("--max-workers", type=int, nargs="+", default=[1, 4], help="Writer thread pool sizes")
+    parser.add_argument("--upload-block-size", type=int, default=None, help="Multipart upload part size in bytes")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    benchmark_dataset_writer(benchmark_args_parser())
@@ -0,0 +1,97 @@
+import argparse
+import subprocess
+import sys
+import time
+
+from typing import Any
+
+from cybulde.utils.io_utils import write_yaml_file
+
+ENTRY_POINT_MODULES = [
+    "cybulde.process_data",
+    "cybulde.train_tokenizer",
+    "cybulde.tokenize_data",
+    "cybulde.sweep_tokenizers",
+    # Imported by every dask worker which unpickles the cleaners
+    "cybulde.data_processing.dataset_cleaners",
+]
+
+
+def parse_import_times(importtime_output: str) -> list[tuple[str, int]]:
+    """
+    (module name, cumulative microseconds) of every module imported, from the -X importtime output
+    """
+    import_times = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        _, cumulative_us, module_name = line.removeprefix("import time:").split("|")
+        import_times.append((module_name.strip(), int(cumulative_us)))
+    return import_times
+
+
+def measure_import_time(module_name: str, nrof_top_packages: int) -> dict[str, Any]:
+    """
+    Import module_name in a new interpreter. The byte code caches are warm, so this is the cold start of a
+    process (e.g. a dask worker), not of a fresh installation.
+    """
+    start_time = time.perf_counter()
+    completed_process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"], capture_output=True, text=True, check=True
+    )
+    wall_seconds = time.perf_counter() - start_time
+
+    import_times = parse_import_times(completed_process.stderr)
+    # Top level packages are only imported once, so their cumulative time is what they add to the start up
+    top_packages = sorted(
+        ((name, cumulative_us) for name, cumulative_us in import_times if "." not in name and name != module_name),
+        key=lambda import_time: import_time[1],
+        reverse=True,
+    )
+    return {
+        "import_seconds": round(dict(import_times)[module_name] / 1e6, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "nrof_modules": len(import_times),
+        "top_packages": {
+            name: round(cumulative_us / 1e6, 3) for name, cumulative_us in top_packages[:nrof_top_packages]
+        },
+    }
+
+
+def benchmark_import_time(args: argparse.Namespace) -> None:
+    results = {}
+    for module_name in args.modules:
+        # The fastest of the repeats, the others are slowed down by the rest of the machine
+        measurements = [measure_import_time(module_name, args.nrof_top_packages) for _ in range(args.nrof_repeats)]
+        results[module_name] = min(measurements, key=lambda measurement: measurement["import_seconds"])
+        print(
+            f"{module_name}: {results[module_name]['import_seconds']:.3f}s import, "
+            f"{results[module_name]['wall_seconds']:.3f}s with interpreter start, "
+            f"{results[module_name]['nrof_modules']} modules"
+        )
+        print(f"    heaviest packages: {results[module_name]['top_packages']}")
+
+    if args.results_path is not None:
+        write_yaml_file(args.results_path, results)
+
+    slow_modules = [
+        module_name for module_name, result in results.items() if result["import_seconds"] > args.max_import_seconds
+    ]
+    if slow_modules:
+        sys.exit(f"Importing {slow_modules} took longer than {args.max_import_seconds}s")
+
+
+def benchmark_args_parser() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", type=str, nargs="+", default=ENTRY_POINT_MODULES, help="Modules to import")
+    parser.add_argument("--nrof-repeats", type=int, default=3, help="Best of this many imports is reported")
+    parser.add_argument("--nrof-top-packages", type=int, default=8, help="Number of heaviest packages to list")
+    parser.add_argument(
+        "--max-import-seconds", type=float, default=float("inf"), help="Exit with an error above this import time"
+    )
+    parser.add_argument("--results-path", type=str, default=None, help="fsspec path of a results yaml file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    benchmark_import_time(benchmark_args_parser())
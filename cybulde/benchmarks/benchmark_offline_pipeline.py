@@ -0,0 +1,98 @@
+import argparse
+import os
+import time
+
+from tempfile import TemporaryDirectory
+from typing import Any, Callable
+
+from cybulde.benchmarks.local_harness import IOStats, local_object_store, write_synthetic_raw_data
+from cybulde.process_data import process_data
+from cybulde.train_tokenizer import train_tokenizer
+from cybulde.utils.config_utils import compose_config
+from cybulde.utils.io_utils import write_yaml_file
+
+FAKE_BUCKET = "fake-bucket"
+
+
+def run_stage(stage_name: str, io_stats: IOStats, stage: Callable[[Any], None], config: Any) -> dict[str, Any]:
+    io_stats.reset()
+    start_time = time.perf_counter()
+    # The undecorated entry point, the config is composed here instead of loaded from a pickle
+    stage.__wrapped__(config)  # type: ignore
+    stage_stats = {"seconds": round(time.perf_counter() - start_time, 3), **io_stats.to_dict()}
+    print(f"{stage_name}: {stage_stats}")
+    return stage_stats
+
+
+def benchmark_offline_pipeline(args: argparse.Namespace) -> None:
+    bandwidth_bytes_per_second = None if args.bandwidth_mbps is None else args.bandwidth_mbps * 1e6 / 8
+    processed_data_save_dir = f"gs://{FAKE_BUCKET}/cybulde/data/processed/offline"
+
+    with TemporaryDirectory() as tmp_dir_name:
+        root_dir = args.root_dir or os.path.join(tmp_dir_name, "fake_gcs")
+        with local_object_store(root_dir, args.latency_ms / 1e3, bandwidth_bytes_per_second) as io_stats:
+            data_processing_config = compose_config(
+                config_path="../configs/",
+                config_name="data_processing_config",
+                overrides=[
+                    "docker_image_name=benchmark",
+                    "docker_image_tag=benchmark",
+                    f"version=synthetic-{args.nrof_rows}",
+                    f"processed_data_save_dir={processed_data_save_dir}",
+                    # The worker threads count their I/O in the stats of this process
+                    "dask_cluster.processes=false",
+                    f"dask_cluster.n_workers={args.nrof_workers}",
+                    "dask_cluster.scheduler_port=0",
+                    "dask_cluster.dashboard_address=:0",
+                    *args.data_processing_overrides,
+                ],
+            )
+            tokenizer_training_config = compose_config(
+                config_path="../configs/",
+                config_name="tokenizer_training_config",
+                overrides=[
+                    "docker_image_name=benchmark",
+                    "docker_image_tag=benchmark",
+                    f"data_parquet_path={processed_data_save_dir}/train.parquet",
+                    "tokenizer.trainer.show_progress=false",
+                    "reuse_cached_tokenizer=false",
+                    *args.tokenizer_training_overrides,
+                ],
+            )
+
+            print(f"Writing {args.nrof_rows} synthetic rows per dataset to the fake DVC remote in {root_dir}...")
+            write_synthetic_raw_data(
+                data_processing_config.data_local_save_dir, data_processing_config.version, args.nrof_rows
+            )
+
+            results = {
+                "latency_ms": args.latency_ms,
+                "bandwidth_mbps": args.bandwidth_mbps,
+                "nrof_rows": args.nrof_rows,
+                "process_data": run_stage("process_data", io_stats, process_data, data_processing_config),
+                "train_tokenizer": run_stage("train_tokenizer", io_stats, train_tokenizer, tokenizer_training_config),
+            }
+
+    if args.results_path is not None:
+        write_yaml_file(args.results_path, results)
+
+
+def benchmark_args_parser() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root-dir", type=str, default=None, help="Local directory of the fake gs:// buckets")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Injected latency per object store request")
+    parser.add_argument("--bandwidth-mbps", type=float, default=None, help="Object store bandwidth, default: no limit")
+    parser.add_argument("--nrof-rows", type=int, default=20_000, help="Synthetic rows per raw dataset file")
+    parser.add_argument("--nrof-workers", type=int, default=4, help="Number of dask worker threads")
+    parser.add_argument(
+        "--data-processing-overrides", type=str, nargs="*", default=[], help="Hydra overrides of process_data"
+    )
+    parser.add_argument(
+        "--tokenizer-training-overrides", type=str, nargs="*", default=[], help="Hydra overrides of train_tokenizer"
+    )
+    parser.add_argument("--results-path", type=str, default=None, help="fsspec path of a results yaml file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    benchmark_offline_pipeline(benchmark_args_parser())
@@ -0,0 +1,186 @@
+import argparse
+import multiprocessing
+import os
+import subprocess
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from hydra.utils import instantiate
+
+from cybulde.benchmarks.local_harness import get_process_stats, local_object_store, write_synthetic_raw_data
+from cybulde.process_data import clean_data, filter_splits
+from cybulde.utils.config_utils import compose_config, custom_instantiate
+from cybulde.utils.io_utils import TMP_FILE_PATH, write_yaml_file
+from cybulde.utils.utils import run_shell_command
+
+FAKE_BUCKET = "fake-bucket"
+
+
+@contextmanager
+def timed_stage(stage_seconds: dict[str, float], stage_name: str) -> Iterator[None]:
+    start_time = time.perf_counter()
+    yield
+    stage_seconds[stage_name] = round(time.perf_counter() - start_time, 3)
+    print(f"{stage_name}: {stage_seconds[stage_name]}s")
+
+
+def get_data_processing_config(nrof_rows: int, nrof_workers: int, worker_type: str, overrides: list[str]) -> Any:
+    return compose_config(
+        config_path="../configs/",
+        config_name="data_processing_config",
+        overrides=[
+            "docker_image_name=benchmark",
+            "docker_image_tag=benchmark",
+            f"version=synthetic-{nrof_rows}",
+            f"processed_data_save_dir=gs://{FAKE_BUCKET}/benchmark_process_data/{nrof_rows}-{nrof_workers}",
+            "dask_cluster=local_dask_cluster",
+            f"dask_cluster.n_workers={nrof_workers}",
+            f"dask_cluster.processes={worker_type == 'processes'}",
+            "dask_cluster.scheduler_port=0",
+            "dask_cluster.dashboard_address=:0",
+            *overrides,
+        ],
+    )
+
+
+def run_process_data(
+    nrof_rows: int,
+    nrof_workers: int,
+    worker_type: str,
+    overrides: list[str],
+    root_dir: str,
+    latency_seconds: float,
+    bandwidth_bytes_per_second: Optional[float],
+) -> dict[str, Any]:
+    """
+    The stages of process_data, timed one by one. Runs in its own process, so that the peak memory
+    of the process (and with worker threads, of the workers) is the one of this run.
+    """
+    config = get_data_processing_config(nrof_rows, nrof_workers, worker_type, overrides)
+    stage_seconds: dict[str, float] = {}
+    with local_object_store(root_dir, latency_seconds, bandwidth_bytes_per_second):
+        with timed_stage(stage_seconds, "setup"):
+            cluster = custom_instantiate(config.dask_cluster)
+            client = cluster.get_client()
+            dataset_reader_manager = instantiate(config.dataset_reader_manager)
+            dataset_cleaner_manager = instantiate(config.dataset_cleaner_manager)
+            dataset_writer = instantiate(config.dataset_writer, _convert_="all")
+        try:
+            # Builds the task graph, the readers compute the split names and the partition sizes eagerly
+            with timed_stage(stage_seconds, "read"):
+                df = dataset_reader_manager.read_data(config.dask_cluster.n_workers)
+            with timed_stage(stage_seconds, "clean"):
+                df = clean_data(df, dataset_cleaner_manager).compute()  # type: ignore[no-untyped-call]
+            with timed_stage(stage_seconds, "filter"):
+                split_dfs = filter_splits(df, config.min_nrof_words)
+            with timed_stage(stage_seconds, "write"):
+                dataset_writer.write_splits(split_dfs, config.processed_data_save_dir)
+
+            # With worker threads every worker reports the stats of this process, so they are deduplicated by pid
+            process_stats = {stats["pid"]: stats for stats in client.run(get_process_stats).values()}
+            process_stats[os.getpid()] = get_process_stats()
+        finally:
+            client.close()
+            cluster.close()
+
+    pipeline_seconds = sum(seconds for stage_name, seconds in stage_seconds.items() if stage_name != "setup")
+    worker_stats = [stats for pid, stats in process_stats.items() if pid != os.getpid()]
+    return {
+        "nrof_rows": nrof_rows,
+        "nrof_workers": nrof_workers,
+        "worker_type": worker_type,
+        "nrof_cleaned_rows": len(df),
+        "nrof_written_rows": sum(len(split_df) for split_df in split_dfs.values()),
+        "stage_seconds": stage_seconds,
+        "pipeline_seconds": round(pipeline_seconds, 3),
+        "rows_per_second": round(len(df) / pipeline_seconds, 1),
+        "peak_rss_bytes": {
+            "driver": process_stats[os.getpid()]["peak_rss_bytes"],
+            "max_worker": max((stats["peak_rss_bytes"] for stats in worker_stats), default=None),
+            "total_workers": sum(stats["peak_rss_bytes"] for stats in worker_stats),
+        },
+        "io": {
+            stat_name: round(sum(stats[stat_name] for stats in process_stats.values()), 3)
+            for stat_name in ["nrof_requests", "nrof_bytes_read", "nrof_bytes_written", "injected_seconds"]
+        },
+    }
+
+
+def get_git_commit() -> Optional[str]:
+    try:
+        return run_shell_command("git rev-parse --short HEAD").strip()
+    except subprocess.CalledProcessError:
+        return None
+
+
+def benchmark_process_data(args: argparse.Namespace) -> None:
+    bandwidth_bytes_per_second = None if args.bandwidth_mbps is None else args.bandwidth_mbps * 1e6 / 8
+
+    runs = []
+    for nrof_rows in args.nrof_rows:
+        config = get_data_processing_config(nrof_rows, 1, args.worker_type, args.overrides)
+        with local_object_store(args.root_dir):
+            print(f"Writing {nrof_rows} synthetic rows per dataset to the fake DVC remote in {args.root_dir}...")
+            write_synthetic_raw_data(config.data_local_save_dir, config.version, nrof_rows)
+
+        for nrof_workers in args.nrof_workers:
+            print(f"Processing {nrof_rows} rows per dataset with {nrof_workers} {args.worker_type} workers...")
+            # spawn, so that every run starts with a fresh interpreter and its own peak memory.
+            # The processes of a ProcessPoolExecutor aren't daemonic, so they can start dask worker processes.
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                run = executor.submit(
+                    run_process_data,
+                    nrof_rows,
+                    nrof_workers,
+                    args.worker_type,
+                    args.overrides,
+                    args.root_dir,
+                    args.latency_ms / 1e3,
+                    bandwidth_bytes_per_second,
+                ).result()
+            print(f"{run['rows_per_second']} rows/s, stages: {run['stage_seconds']}")
+            runs.append(run)
+
+    print(f"{'rows':>10} {'workers':>8} {'read':>8} {'clean':>8} {'filter':>8} {'write':>8} {'rows/s':>10}")
+    for run in runs:
+        stage_seconds = run["stage_seconds"]
+        print(
+            f"{run['nrof_rows']:>10} {run['nrof_workers']:>8} {stage_seconds['read']:>8} {stage_seconds['clean']:>8} "
+            f"{stage_seconds['filter']:>8} {stage_seconds['write']:>8} {run['rows_per_second']:>10}"
+        )
+
+    if args.results_path is not None:
+        write_yaml_file(
+            args.results_path,
+            {
+                "git_commit": get_git_commit(),
+                "latency_ms": args.latency_ms,
+                "bandwidth_mbps": args.bandwidth_mbps,
+                "runs": runs,
+            },
+        )
+
+
+def benchmark_args_parser() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--root-dir",
+        type=str,
+        default=os.path.join(TMP_FILE_PATH, "benchmark_process_data"),
+        help="Local directory of the fake gs:// buckets, the synthetic raw data is reused between runs",
+    )
+    parser.add_argument("--nrof-rows", type=int, nargs="+", default=[100_000], help="Synthetic rows per raw dataset")
+    parser.add_argument("--nrof-workers", type=int, nargs="+", default=[1, 4], help="Dask worker counts")
+    parser.add_argument("--worker-type", type=str, choices=["processes", "threads"], default="processes")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Injected latency per object store request")
+    parser.add_argument("--bandwidth-mbps", type=float, default=None, help="Object store bandwidth, default: no limit")
+    parser.add_argument("--overrides", type=str, nargs="*", default=[], help="Hydra overrides of the config")
+    parser.add_argument("--results-path", type=str, default=None, help="fsspec path of a results yaml file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    benchmark_process_data(benchmark_args_parser())
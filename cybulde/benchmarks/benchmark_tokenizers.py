@@ -0,0 +1,192 @@
+import argparse
+import multiprocessing
+import os
+import time
+
+from tempfile import TemporaryDirectory
+from typing import Any, Optional
+
+import numpy as np
+
+from hydra.utils import instantiate
+from tokenizers import Tokenizer
+
+from cybulde.benchmarks.benchmark_dataset_writer import get_synthetic_split_dfs
+from cybulde.utils.config_utils import compose_config
+from cybulde.utils.data_utils import get_parquet_dataset
+from cybulde.utils.io_utils import write_yaml_file
+
+
+def train_synthetic_tokenizer(tokenizer_config_name: str, vocab_size: int, texts: list[str], save_dir: str) -> None:
+    config = compose_config(
+        config_path="../configs/",
+        config_name="tokenizer_training_config",
+        overrides=[
+            "docker_image_name=benchmark",
+            "docker_image_tag=benchmark",
+            f"tokenizer={tokenizer_config_name}",
+            f"tokenizer.trainer.vocab_size={vocab_size}",
+            "tokenizer.trainer.show_progress=false",
+        ],
+    )
+    tokenizer = instantiate(config.tokenizer, _convert_="all")
+    tokenizer.train(texts, length=len(texts))
+    tokenizer.save(save_dir)
+
+
+def load_tokenizer(tokenizer_dir: str) -> Tokenizer:
+    tokenizer: Tokenizer = Tokenizer.from_file(os.path.join(tokenizer_dir, "tokenizer.json"))
+    return tokenizer
+
+
+def benchmark_latency(tokenizer_dir: str, texts: list[str]) -> dict[str, float]:
+    tokenizer = load_tokenizer(tokenizer_dir)
+    tokenizer.no_padding()
+    tokenizer.encode(texts[0])
+
+    latencies = np.empty(len(texts), dtype=np.float64)
+    for idx, text in enumerate(texts):
+        start_time = time.perf_counter_ns()
+        tokenizer.encode(text)
+        latencies[idx] = (time.perf_counter_ns() - start_time) / 1e3
+
+    return {
+        "mean_us": round(float(latencies.mean()), 2),
+        "p50_us": round(float(np.percentile(latencies, 50)), 2),
+        "p90_us": round(float(np.percentile(latencies, 90)), 2),
+        "p99_us": round(float(np.percentile(latencies, 99)), 2),
+        "max_us": round(float(latencies.max()), 2),
+    }
+
+
+def benchmark_throughput(
+    tokenizer_dir: str, texts: list[str], batch_sizes: list[int], nrof_repeats: int
+) -> list[dict[str, Any]]:
+    """
+    Runs in its own process, as the size of the tokenizers thread pool (RAYON_NUM_THREADS) is fixed
+    the first time it is used
+    """
+    tokenizer = load_tokenizer(tokenizer_dir)
+    # Tokenizers trained with a pad_token are saved with padding enabled
+    saved_padding = tokenizer.padding
+    pad_token = "[PAD]" if saved_padding is None else saved_padding["pad_token"]
+    pad_id = tokenizer.token_to_id(pad_token)
+
+    results = []
+    for is_padded in [False, True]:
+        if is_padded and pad_id is None:
+            continue
+        if is_padded:
+            tokenizer.enable_padding(pad_id=pad_id, pad_token=pad_token)
+        else:
+            tokenizer.no_padding()
+
+        for batch_size in batch_sizes:
+            batches = [texts[start_idx : start_idx + batch_size] for start_idx in range(0, len(texts), batch_size)]
+            tokenizer.encode_batch(batches[0])
+
+            best_seconds = np.inf
+            for _ in range(nrof_repeats):
+                nrof_tokens = 0
+                nrof_pad_tokens = 0
+                start_time = time.perf_counter()
+                for batch in batches:
+                    for encoding in tokenizer.encode_batch(batch):
+                        nrof_tokens += len(encoding.ids)
+                        if is_padded:
+                            nrof_pad_tokens += len(encoding.attention_mask) - sum(encoding.attention_mask)
+                best_seconds = min(best_seconds, time.perf_counter() - start_time)
+
+            results.append(
+                {
+                    "rayon_num_threads": int(os.environ.get("RAYON_NUM_THREADS", 0)),
+                    "batch_size": batch_size,
+                    "padded": is_padded,
+                    "seconds": round(best_seconds, 4),
+                    "texts_per_second": round(len(texts) / best_seconds, 1),
+                    "tokens_per_second": round((nrof_tokens - nrof_pad_tokens) / best_seconds, 1),
+                    "pad_token_share": round(nrof_pad_tokens / max(nrof_tokens, 1), 4),
+                }
+            )
+    return results
+
+
+def set_rayon_num_threads(rayon_num_threads: int) -> None:
+    os.environ["RAYON_NUM_THREADS"] = str(rayon_num_threads)
+
+
+def get_synthetic_texts(nrof_texts: int, seed: int = 1234) -> list[str]:
+    # The synthetic rows are spread over the splits, so all of them are needed to get nrof_texts texts
+    split_dfs = get_synthetic_split_dfs(nrof_texts, seed=seed)
+    return [text for split_df in split_dfs.values() for text in split_df["text"]]
+
+
+def get_benchmark_texts(data_parquet_path: Optional[str], text_column_name: str, nrof_texts: int) -> list[str]:
+    if data_parquet_path is None:
+        return get_synthetic_texts(nrof_texts, seed=4321)
+    dataset = get_parquet_dataset(data_parquet_path)
+    texts: list[str] = dataset.head(nrof_texts, columns=[text_column_name]).column(0).to_pylist()
+    return texts
+
+
+def benchmark_tokenizers(args: argparse.Namespace) -> None:
+    texts = get_benchmark_texts(args.data_parquet_path, args.text_column_name, args.nrof_texts)
+
+    with TemporaryDirectory() as tmp_dir_name:
+        tokenizer_dir = args.tokenizer_dir
+        if tokenizer_dir is None:
+            tokenizer_dir = os.path.join(tmp_dir_name, "trained_tokenizer")
+            training_texts = get_synthetic_texts(args.nrof_training_texts)
+            print(f"Training {args.tokenizer_config_name} on {len(training_texts)} synthetic texts...")
+            train_synthetic_tokenizer(args.tokenizer_config_name, args.vocab_size, training_texts, tokenizer_dir)
+
+        latency = benchmark_latency(tokenizer_dir, texts[: args.nrof_latency_texts])
+        print(f"single text latency: {latency}")
+
+        # spawn, as the tokenizers thread pool doesn't survive a fork
+        context = multiprocessing.get_context("spawn")
+        throughput = []
+        for nrof_threads in args.nrof_threads:
+            with context.Pool(1, initializer=set_rayon_num_threads, initargs=(nrof_threads,)) as pool:
+                throughput.extend(
+                    pool.apply(benchmark_throughput, (tokenizer_dir, texts, args.batch_sizes, args.nrof_repeats))
+                )
+
+    print(f"{'threads':>8} {'batch':>6} {'padded':>7} {'texts/s':>12} {'tokens/s':>12} {'pad share':>10}")
+    for result in throughput:
+        print(
+            f"{result['rayon_num_threads']:>8} {result['batch_size']:>6} {str(result['padded']):>7} "
+            f"{result['texts_per_second']:>12} {result['tokens_per_second']:>12} {result['pad_token_share']:>10}"
+        )
+
+    if args.results_path is not None:
+        write_yaml_file(
+            args.results_path,
+            {
+                "tokenizer_dir": args.tokenizer_dir,
+                "nrof_texts": len(texts),
+                "latency": latency,
+                "throughput": throughput,
+            },
+        )
+
+
+def benchmark_args_parser() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokenizer-dir", type=str, default=None, help="Trained tokenizer, default: train one")
+    parser.add_argument("--tokenizer-config-name", type=str, default="bpe_tokenizer", help="Tokenizer config to train")
+    parser.add_argument("--vocab-size", type=int, default=8000, help="Vocab size of the trained tokenizer")
+    parser.add_argument("--nrof-training-texts", type=int, default=50_000, help="Synthetic texts to train on")
+    parser.add_argument("--data-parquet-path", type=str, default=None, help="Texts to encode, default: synthetic")
+    parser.add_argument("--text-column-name", type=str, default="cleaned_text", help="Text column of the parquet")
+    parser.add_argument("--nrof-texts", type=int, default=20_000, help="Number of texts to encode")
+    parser.add_argument("--nrof-latency-texts", type=int, default=2_000, help="Texts encoded one by one")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256, 1024], help="encode_batch sizes")
+    parser.add_argument("--nrof-threads", type=int, nargs="+", default=[1, 2, 4], help="RAYON_NUM_THREADS values")
+    parser.add_argument("--nrof-repeats", type=int, default=3, help="Best of this many runs is reported")
+    parser.add_argument("--results-path", type=str, default=None, help="fsspec path of a results yaml file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    benchmark_tokenizers(benchmark_args_parser())
@@ -0,0 +1,396 @@
+import json
+import os
+import resource
+import string
+import threading
+import time
+
+from contextlib import ExitStack, contextmanager
+from typing import Any, Iterator, Optional, TypedDict
+from unittest.mock import patch
+
+import dask
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import yaml
+
+from fsspec import AbstractFileSystem, register_implementation
+from fsspec.implementations.dirfs import DirFileSystem
+from fsspec.implementations.local import LocalFileSystem
+from fsspec.registry import _registry
+
+from cybulde.utils.io_utils import GCS_PREFIX, TMP_FILE_PATH
+
+FAKE_GCS_PROTOCOLS = ("gs", "gcs")
+FAKE_DVC_REMOTE_BUCKET = "fake-dvc-remote"
+FAKE_ACCESS_TOKEN = "fake-access-token"
+GCS_REQUEST_BLOCK_SIZE = 5 * 1024**2
+FAKE_GCS_SETTINGS_ENV_VAR = "CYBULDE_FAKE_GCS_SETTINGS"
+SYNTHETIC_RAW_DATA_MARKER_FILE_NAME = "synthetic_raw_data.yaml"
+
+
+class IOStats:
+    """
+    Requests, transferred bytes and injected delays of the fake object store, shared by all its instances
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.nrof_requests = 0
+        self.nrof_bytes_read = 0
+        self.nrof_bytes_written = 0
+        self.injected_seconds = 0.0
+
+    def add(
+        self, nrof_requests: int = 0, nrof_bytes_read: int = 0, nrof_bytes_written: int = 0, injected_seconds: float = 0
+    ) -> None:
+        with self.lock:
+            self.nrof_requests += nrof_requests
+            self.nrof_bytes_read += nrof_bytes_read
+            self.nrof_bytes_written += nrof_bytes_written
+            self.injected_seconds += injected_seconds
+
+    def to_dict(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "nrof_requests": self.nrof_requests,
+                "nrof_bytes_read": self.nrof_bytes_read,
+                "nrof_bytes_written": self.nrof_bytes_written,
+                "injected_seconds": round(self.injected_seconds, 3),
+            }
+
+
+class ThrottledFile:
+    """
+    File of the fake object store. Every request_block_size bytes cost one request, like the ranged reads
+    and the resumable upload parts of GCS, and the transfer is limited to the configured bandwidth.
+    """
+
+    def __init__(self, f: Any, file_system: "FakeGCSFileSystem") -> None:
+        self.f = f
+        self.file_system = file_system
+        self.nrof_unbilled_bytes = 0
+
+    def throttle(self, nrof_bytes: int, is_write: bool) -> None:
+        file_system = self.file_system
+        self.nrof_unbilled_bytes += nrof_bytes
+        nrof_requests, self.nrof_unbilled_bytes = divmod(self.nrof_unbilled_bytes, file_system.request_block_size)
+        delay_seconds = nrof_requests * file_system.latency_seconds
+        if file_system.bandwidth_bytes_per_second:
+            delay_seconds += nrof_bytes / file_system.bandwidth_bytes_per_second
+        if delay_seconds > 0:
+            time.sleep(delay_seconds)
+        file_system.io_stats.add(
+            nrof_requests=nrof_requests,
+            nrof_bytes_read=0 if is_write else nrof_bytes,
+            nrof_bytes_written=nrof_bytes if is_write else 0,
+            injected_seconds=delay_seconds,
+        )
+
+    def read(self, *args: Any) -> Any:
+        data = self.f.read(*args)
+        self.throttle(len(data), is_write=False)
+        return data
+
+    def read1(self, *args: Any) -> Any:
+        data = self.f.read1(*args)
+        self.throttle(len(data), is_write=False)
+        return data
+
+    def readline(self, *args: Any) -> Any:
+        data = self.f.readline(*args)
+        self.throttle(len(data), is_write=False)
+        return data
+
+    def readinto(self, buffer: Any) -> Any:
+        nrof_bytes = self.f.readinto(buffer)
+        self.throttle(nrof_bytes or 0, is_write=False)
+        return nrof_bytes
+
+    def write(self, data: Any) -> Any:
+        self.throttle(len(data), is_write=True)
+        return self.f.write(data)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.readline, self.f.read(0))
+
+    def __enter__(self) -> "ThrottledFile":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.f.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.f, name)
+
+
+class FakeGCSFileSystem(DirFileSystem):  # type: ignore[misc]
+    """
+    Stand-in for gcsfs, which keeps the buckets as directories under root_dir.
+    Every request (open, info, ls, find, copy) waits latency_seconds, and reads and writes are limited to
+    bandwidth_bytes_per_second. The settings are class attributes, as fsspec and dask create their own
+    instances from the protocol, see local_object_store.
+    """
+
+    protocol = FAKE_GCS_PROTOCOLS
+    root_dir = os.path.join(TMP_FILE_PATH, "fake_gcs")
+    latency_seconds = 0.0
+    bandwidth_bytes_per_second: Optional[float] = None
+    request_block_size = GCS_REQUEST_BLOCK_SIZE
+    io_stats = IOStats()
+
+    def __init__(self, **storage_options: Any) -> None:
+        super().__init__(path=self.root_dir, fs=LocalFileSystem(), **storage_options)
+
+    def request(self) -> None:
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+        self.io_stats.add(nrof_requests=1, injected_seconds=self.latency_seconds)
+
+    def open(self, path: str, mode: str = "rb", *args: Any, **kwargs: Any) -> ThrottledFile:
+        self.request()
+        if "w" in mode:
+            self.fs.makedirs(os.path.dirname(self._join(path)), exist_ok=True)
+        return ThrottledFile(super().open(path, mode, *args, **kwargs), self)
+
+    def info(self, path: str, **kwargs: Any) -> dict[str, Any]:
+        self.request()
+        file_info: dict[str, Any] = super().info(path, **kwargs)
+        return file_info
+
+    def ls(self, path: str, detail: bool = False, **kwargs: Any) -> Any:
+        # Paths only by default, like gcsfs
+        self.request()
+        return super().ls(path, detail=detail, **kwargs)
+
+    def find(self, path: str, *args: Any, **kwargs: Any) -> Any:
+        self.request()
+        return super().find(path, *args, **kwargs)
+
+    def copy(self, path1: str, path2: str, *args: Any, **kwargs: Any) -> None:
+        # Server side copy, the content doesn't pass through the bandwidth limit
+        self.request()
+        super().copy(path1, path2, *args, **kwargs)
+
+    # Downloads and uploads go through open, so they are throttled like every other transfer
+    def get_file(self, rpath: str, lpath: str, *args: Any, **kwargs: Any) -> None:
+        AbstractFileSystem.get_file(self, rpath, lpath, *args, **kwargs)
+
+    def put_file(self, lpath: str, rpath: str, *args: Any, **kwargs: Any) -> None:
+        AbstractFileSystem.put_file(self, lpath, rpath, *args, **kwargs)
+
+    def get(self, rpath: Any, lpath: Any, *args: Any, **kwargs: Any) -> None:
+        AbstractFileSystem.get(self, rpath, lpath, *args, **kwargs)
+
+    def put(self, lpath: Any, rpath: Any, *args: Any, **kwargs: Any) -> None:
+        AbstractFileSystem.put(self, lpath, rpath, *args, **kwargs)
+
+
+def get_fake_gcs_local_path(url: str) -> str:
+    return os.path.join(FakeGCSFileSystem.root_dir, url.removeprefix(GCS_PREFIX))
+
+
+def get_fake_dvc_url(path: str, repo: Optional[str] = None, rev: Optional[str] = None, **kwargs: Any) -> str:
+    """
+    Stand-in for dvc.api.get_url. The fake DVC remote keeps the files by version and path
+    instead of by content hash, so the tracked files can be written without a git repository.
+    """
+    return f"{GCS_PREFIX}{FAKE_DVC_REMOTE_BUCKET}/{rev}/{os.path.normpath(path)}"
+
+
+def get_fake_access_token(project_id: str, secret_id: str, version_id: str = "1") -> str:
+    return FAKE_ACCESS_TOKEN
+
+
+class FakeGCSSettings(TypedDict):
+    root_dir: str
+    latency_seconds: float
+    bandwidth_bytes_per_second: Optional[float]
+
+
+def register_fake_gcs(
+    root_dir: str, latency_seconds: float = 0.0, bandwidth_bytes_per_second: Optional[float] = None
+) -> None:
+    FakeGCSFileSystem.root_dir = root_dir
+    FakeGCSFileSystem.latency_seconds = latency_seconds
+    FakeGCSFileSystem.bandwidth_bytes_per_second = bandwidth_bytes_per_second
+    FakeGCSFileSystem.clear_instance_cache()
+    for protocol in FAKE_GCS_PROTOCOLS:
+        register_implementation(protocol, FakeGCSFileSystem, clobber=True)
+
+
+def dask_setup(worker: Any) -> None:
+    """
+    Called by dask in every worker process which preloads this module, see local_object_store
+    """
+    register_fake_gcs(**json.loads(os.environ[FAKE_GCS_SETTINGS_ENV_VAR]))
+
+
+def get_process_stats() -> dict[str, Any]:
+    """
+    I/O stats and peak memory of the calling process, run it on the workers with client.run
+    """
+    return {
+        "pid": os.getpid(),
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        **FakeGCSFileSystem.io_stats.to_dict(),
+    }
+
+
+@contextmanager
+def local_object_store(
+    root_dir: str, latency_seconds: float = 0.0, bandwidth_bytes_per_second: Optional[float] = None
+) -> Iterator[IOStats]:
+    """
+    Serve gs:// (and gcs://) paths from root_dir, answer DVC url lookups from the fake DVC remote bucket,
+    and skip the Secret Manager lookup of the GitHub access token.
+    Worker processes of dask clusters created inside the context preload this module, which registers the
+    fake file system there too. Their I/O stats are kept in the workers, see get_process_stats.
+    """
+    previous_file_systems = {protocol: _registry.get(protocol) for protocol in FAKE_GCS_PROTOCOLS}
+    settings: FakeGCSSettings = {
+        "root_dir": root_dir,
+        "latency_seconds": latency_seconds,
+        "bandwidth_bytes_per_second": bandwidth_bytes_per_second,
+    }
+    register_fake_gcs(**settings)
+    FakeGCSFileSystem.io_stats.reset()
+
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(patch.dict(os.environ, {FAKE_GCS_SETTINGS_ENV_VAR: json.dumps(settings)}))
+            stack.enter_context(dask.config.set({"distributed.worker.preload": [__name__]}))
+            stack.enter_context(patch("cybulde.utils.data_utils.access_secret_version", get_fake_access_token))
+            stack.enter_context(patch("cybulde.data_processing.dataset_readers.get_url", get_fake_dvc_url))
+            yield FakeGCSFileSystem.io_stats
+    finally:
+        for protocol, file_system_class in previous_file_systems.items():
+            if file_system_class is None:
+                # fsspec has no public way to unregister, gcsfs is imported again on the next use
+                _registry.pop(protocol, None)
+            else:
+                register_implementation(protocol, file_system_class, clobber=True)
+
+
+def get_synthetic_word(idx: int) -> str:
+    """
+    A letters only word (the cleaners remove words with digits) which is not an english stop word
+    """
+    letters = []
+    while True:
+        idx, letter_idx = divmod(idx, len(string.ascii_lowercase))
+        letters.append(string.ascii_lowercase[letter_idx])
+        if idx == 0:
+            return "xx" + "".join(letters)
+
+
+def get_synthetic_texts(rng: np.random.Generator, nrof_texts: int) -> pd.Series:
+    """
+    Short social media like texts, with the mentions, urls, retweet markers and punctuation the cleaners remove.
+    The words are drawn and joined in arrow, so that millions of texts can be generated.
+    """
+    vocabulary = pa.array([get_synthetic_word(idx) for idx in range(20_000)])
+    noise_tokens = pa.array(["@user", "http://t.co/abc", "RT", "!!!", "?", "#tag", "LOL", "&amp;", "é", "123"])
+
+    offsets = np.zeros(nrof_texts + 1, dtype=np.int32)
+    np.cumsum(rng.integers(1, 50, size=nrof_texts), out=offsets[1:])
+    nrof_words = int(offsets[-1])
+    # Zipf distributed word frequencies, sampled with the inverse of their cumulative distribution
+    word_cdf = np.cumsum(1.0 / np.arange(1, len(vocabulary) + 1) ** 1.3)
+    word_ids = np.searchsorted(word_cdf, rng.random(nrof_words) * word_cdf[-1])
+    words = vocabulary.take(np.minimum(word_ids, len(vocabulary) - 1))
+    noise = noise_tokens.take(rng.integers(0, len(noise_tokens), size=nrof_words))
+    words = pc.if_else(rng.random(nrof_words) < 0.1, noise, words)
+
+    texts: pd.Series = pc.binary_join(pa.ListArray.from_arrays(offsets, words), " ").to_pandas()
+    return texts
+
+
+def get_synthetic_raw_dfs(nrof_rows: int, seed: int = 1234) -> dict[str, pd.DataFrame]:
+    """
+    Raw files of the ghc, jigsaw-toxic-comment and twitter datasets with the columns their readers use,
+    keyed by their path relative to data_local_save_dir
+    """
+    rng = np.random.default_rng(seed)
+    jigsaw_label_columns = ["toxic", "severe_toxic", "obscene", "threat", "insult", "identity_hate"]
+
+    def get_binary_labels(size: int, positive_rate: float) -> np.ndarray:
+        labels: np.ndarray = (rng.random(size) < positive_rate).astype(int)
+        return labels
+
+    raw_dfs = {}
+    for file_name, size in [("ghc_train.tsv", nrof_rows), ("ghc_test.tsv", nrof_rows // 4)]:
+        raw_dfs[os.path.join("ghc", file_name)] = pd.DataFrame(
+            {
+                "text": get_synthetic_texts(rng, size),
+                "hd": get_binary_labels(size, 0.05),
+                "cv": get_binary_labels(size, 0.02),
+                "vo": get_binary_labels(size, 0.02),
+            }
+        )
+
+    jigsaw_dir = "jigsaw-toxic-comment"
+    raw_dfs[os.path.join(jigsaw_dir, "train.csv")] = pd.DataFrame(
+        {
+            "id": [f"train{idx:08d}" for idx in range(nrof_rows)],
+            "comment_text": get_synthetic_texts(rng, nrof_rows),
+            **{column: get_binary_labels(nrof_rows, 0.04) for column in jigsaw_label_columns},
+        }
+    )
+    nrof_test_rows = nrof_rows // 2
+    test_ids = [f"test{idx:08d}" for idx in range(nrof_test_rows)]
+    raw_dfs[os.path.join(jigsaw_dir, "test.csv")] = pd.DataFrame(
+        {"id": test_ids, "comment_text": get_synthetic_texts(rng, nrof_test_rows)}
+    )
+    # Test rows without labels are marked with -1 in every label column
+    is_unlabeled = rng.random(nrof_test_rows) < 0.4
+    raw_dfs[os.path.join(jigsaw_dir, "test_labels.csv")] = pd.DataFrame(
+        {
+            "id": test_ids,
+            **{
+                column: np.where(is_unlabeled, -1, get_binary_labels(nrof_test_rows, 0.04))
+                for column in jigsaw_label_columns
+            },
+        }
+    )
+
+    cyberbullying_types = ["not_cyberbullying", "religion", "age", "gender", "ethnicity", "other_cyberbullying"]
+    raw_dfs[os.path.join("twitter", "cyberbullying_tweets.csv")] = pd.DataFrame(
+        {
+            "tweet_text": get_synthetic_texts(rng, nrof_rows),
+            "cyberbullying_type": rng.choice(cyberbullying_types, size=nrof_rows),
+        }
+    )
+    return raw_dfs
+
+
+def write_synthetic_raw_data(data_local_save_dir: str, version: str, nrof_rows: int, seed: int = 1234) -> None:
+    """
+    Write synthetic raw datasets into the fake DVC remote, where get_fake_dvc_url finds them.
+    The files are written directly to the local root, so they don't count towards the I/O stats.
+    Files generated with the same arguments before are kept, so that large datasets are only generated once.
+    """
+
+    def get_local_path(relative_path: str) -> str:
+        return get_fake_gcs_local_path(get_fake_dvc_url(os.path.join(data_local_save_dir, relative_path), rev=version))
+
+    # Written last, so that it only exists if every file was written
+    marker_path = get_local_path(SYNTHETIC_RAW_DATA_MARKER_FILE_NAME)
+    marker = {"nrof_rows": nrof_rows, "seed": seed}
+    if os.path.isfile(marker_path):
+        with open(marker_path, "r") as marker_file:
+            if yaml.safe_load(marker_file) == marker:
+                return
+
+    for relative_path, df in get_synthetic_raw_dfs(nrof_rows, seed).items():
+        local_path = get_local_path(relative_path)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        df.to_csv(local_path, sep="\t" if local_path.endswith(".tsv") else ",", index=False)
+
+    with open(marker_path, "w") as marker_file:
+        yaml.dump(marker, marker_file)
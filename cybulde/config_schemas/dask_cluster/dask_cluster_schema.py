@@ -11,10 +11,28 @@ class WorkerClassConfig:
     pass
 
 
+@dataclass
+class AdaptiveScalingConfig:
+    # Adaptive scaling is enabled by setting maximum. The cluster then starts with n_workers workers, and keeps
+    # between minimum and maximum workers, as many as can finish the queued tasks in about target_duration.
+    # Workers which join or leave during a run aren't in its trace, memory report and partition profile.
+    minimum: int = 1
+    maximum: Optional[int] = None
+    target_duration: str = "5s"
+    # How often the scheduler is asked for the number of workers, and how many times in a row a worker has to
+    # be idle to be released
+    interval: str = "1s"
+    wait_count: int = 3
+
+
 @dataclass
 class DaskClusterConfig:
     _target_: str = MISSING
     n_workers: int = 1
+    adaptive: AdaptiveScalingConfig = AdaptiveScalingConfig()
+    # Address of a running scheduler to use instead of creating a cluster, e.g. tcp://localhost:8786 for a cluster
+    # started with persistent_dask_cluster.py start. The cluster is left running after the run.
+    scheduler_address: Optional[str] = None
 
 
 @dataclass
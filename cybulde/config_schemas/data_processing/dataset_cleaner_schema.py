@@ -1,9 +1,10 @@
 import string
 
 from dataclasses import field
+from typing import Optional
 
 from hydra.core.config_store import ConfigStore
-from omegaconf import MISSING
+from omegaconf import MISSING, SI
 from pydantic.dataclasses import dataclass
 
 
@@ -82,6 +83,7 @@ class CharacterLimiterDatasetCleanerConfig(DatasetCleanerConfig):
 class DatasetCleanerManagerConfig:
     _target_: str = "cybulde.data_processing.dataset_cleaners.DatasetCleanerManager"
     dataset_cleaners: dict[str, DatasetCleanerConfig] = field(default_factory=lambda: {})
+    min_nrof_words: Optional[int] = SI("${min_nrof_words}")
 
 
 def setup_config() -> None:
@@ -42,6 +42,10 @@ class DatasetReaderManagerConfig:
     dataset_readers: dict[str, DatasetReaderConfig] = MISSING
     repartition: bool = True
     available_memory: Optional[float] = None
+    # Process a seeded sample of every dataset, with the same split and label proportions, e.g. to iterate on cleaners
+    sample_fraction: Optional[float] = None
+    max_rows_per_dataset: Optional[int] = None
+    sample_seed: int = 1234
 
 
 def setup_config() -> None:
@@ -0,0 +1,42 @@
+from dataclasses import field
+from typing import Optional
+
+from hydra.core.config_store import ConfigStore
+from omegaconf import MISSING
+from pydantic import field_validator
+from pydantic.dataclasses import dataclass
+
+from cybulde.utils.schema_utils import validate_config_parameter_is_in
+
+PARQUET_COMPRESSION_OPTIONS = {"none", "snappy", "gzip", "brotli", "lz4", "zstd"}
+
+
+@dataclass
+class DatasetWriterConfig:
+    _target_: str = MISSING
+    max_workers: int = 4
+    upload_block_size: Optional[int] = 16 * 1024**2
+    nrof_shards: Optional[int] = None
+    shuffle_seed: int = 1234
+    write_arrow_ipc: bool = False
+
+
+@dataclass
+class ParquetDatasetWriterConfig(DatasetWriterConfig):
+    _target_: str = "cybulde.data_processing.dataset_writers.ParquetDatasetWriter"
+    row_group_size: Optional[int] = 100_000
+    compression: str = "snappy"
+    compression_level: Optional[int] = None
+    dictionary_columns: Optional[list[str]] = field(default_factory=lambda: ["split", "dataset_name"])
+    sort_columns: Optional[list[str]] = None
+    write_statistics: bool = True
+
+    @field_validator("compression")
+    def validate_compression(cls, compression: str) -> str:
+        validate_config_parameter_is_in(PARQUET_COMPRESSION_OPTIONS, compression, "compression")
+        return compression
+
+
+def setup_config() -> None:
+    cs = ConfigStore.instance()
+    cs.store(name="parquet_dataset_writer_schema", node=ParquetDatasetWriterConfig, group="dataset_writer")
@@ -1,9 +1,11 @@
+from typing import Optional
+
 from hydra.core.config_store import ConfigStore
 from omegaconf import MISSING
 from pydantic.dataclasses import dataclass
 
 from cybulde.config_schemas.dask_cluster import dask_cluster_schema
-from cybulde.config_schemas.data_processing import dataset_cleaner_schema, dataset_readers_schema
+from cybulde.config_schemas.data_processing import dataset_cleaner_schema, dataset_readers_schema, dataset_writer_schema
 from cybulde.config_schemas.infrastructure import gcp_schema
 
 
@@ -19,6 +21,7 @@ class DataProcessingConfig:
     infrastructure: gcp_schema.GCPConfig = gcp_schema.GCPConfig()
     dataset_reader_manager: dataset_readers_schema.DatasetReaderManagerConfig = MISSING
     dataset_cleaner_manager: dataset_cleaner_schema.DatasetCleanerManagerConfig = MISSING
+    dataset_writer: dataset_writer_schema.DatasetWriterConfig = MISSING
     dask_cluster: dask_cluster_schema.DaskClusterConfig = MISSING
 
     processed_data_save_dir: str = MISSING
@@ -30,11 +33,29 @@ class DataProcessingConfig:
 
     min_nrof_words: int = 2
 
+    # Save a dask performance report, the task stream and the worker profile to processed_data_save_dir
+    save_dask_diagnostics: bool = False
+    # Save the spans of the read, clean, filter and write stages (also on the workers) to processed_data_save_dir,
+    # as process_data_trace.json (open in ui.perfetto.dev) and process_data_trace_summary.yaml
+    save_trace: bool = False
+    # Save the peak RSS and Python allocations of the driver and the workers per stage, and the largest partitions,
+    # to processed_data_save_dir as memory_report.yaml. Tracing the Python allocations slows the run down.
+    save_memory_report: bool = False
+    memory_sampling_interval_seconds: float = 0.1
+    # Sample the stacks of this fraction of the cleaned partitions on the workers, e.g. 0.1 for every 10th one,
+    # and save them to processed_data_save_dir as process_data_partition_profile.collapsed (open in speedscope.app)
+    profile_partition_fraction: Optional[float] = None
+    profiling_interval_seconds: float = 0.005
+
+    # Rows read from the start of every raw file by process_data.py --plan
+    plan_nrof_sample_rows: int = 2_000
+
 
 def setup_config() -> None:
     gcp_schema.setup_config()
     dataset_readers_schema.setup_config()
     dataset_cleaner_schema.setup_config()
+    dataset_writer_schema.setup_config()
     dask_cluster_schema.setup_config()
     cs = ConfigStore.instance()
     cs.store(name="data_processing_config_schema", node=DataProcessingConfig)
@@ -17,7 +17,7 @@ class BPEModelConfig(ModelConfig):
     merges: Optional[list[Any]] = None
     cache_capacity: int = 10_000
     dropout: Optional[float] = None
-    unk_token: Optional[str] = SI("${tokenizer.unk_token}")
+    unk_token: Optional[str] = SI("${..unk_token}")
     fuse_unk: bool = False
 
 
@@ -31,15 +31,15 @@ class UnigramModelConfig(ModelConfig):
 class WordLevelModelConfig(ModelConfig):
     _target_: str = "tokenizers.models.WordLevel"
     vocab: Optional[dict[str, int]] = None
-    unk_token: Optional[str] = SI("${tokenizer.unk_token}")
+    unk_token: Optional[str] = SI("${..unk_token}")
 
 
 @dataclass
 class WordPieceModelConfig(ModelConfig):
     _target_: str = "tokenizers.models.WordPiece"
     vocab: Optional[dict[str, int]] = None
-    unk_token: Optional[str] = SI("${tokenizer.unk_token}")
-    max_input_chars_per_word: Optional[int] = None
+    unk_token: Optional[str] = SI("${..unk_token}")
+    max_input_chars_per_word: int = 100
 
 
 def setup_config() -> None:
@@ -19,11 +19,11 @@ class TrainerConfig:
     min_frequency: int = 0
     special_tokens: Optional[list[str]] = field(
         default_factory=lambda: [
-            SI("${tokenizer.unk_token}"),
-            SI("${tokenizer.cls_token}"),
-            SI("${tokenizer.sep_token}"),
-            SI("${tokenizer.pad_token}"),
-            SI("${tokenizer.mask_token}"),
+            SI("${...unk_token}"),
+            SI("${...cls_token}"),
+            SI("${...sep_token}"),
+            SI("${...pad_token}"),
+            SI("${...mask_token}"),
         ]
     )
 
@@ -39,9 +39,9 @@ class BpeTrainerConfig(TrainerConfig):
 class UnigramTrainerConfig(TrainerConfig):
     _target_: str = "tokenizers.trainers.UnigramTrainer"
     vocab_size: int = 8000
-    initial_alphabet: Optional[list[str]] = None
+    initial_alphabet: list[str] = field(default_factory=lambda: [])
     shrinking_factor: float = 0.75
-    unk_token: Optional[str] = SI("${tokenizer.unk_token}")
+    unk_token: Optional[str] = SI("${..unk_token}")
     max_piece_length: int = 16
     n_sub_iterations: int = 2
 
@@ -53,11 +53,12 @@ class WordLevelTrainerConfig(TrainerConfig):
 
 @dataclass
 class WordPieceTrainerConfig(TrainerConfig):
-    _target_: str = "tokenizers.trainers.WordPieceTrainer"
+    # WordPieceTrainer doesn't take None for limit_alphabet and end_of_word_suffix, this passes them only when set
+    _target_: str = "cybulde.tokenization.tokenizers.get_word_piece_trainer"
     vocab_size: int = 30000
     limit_alphabet: Optional[int] = None
     initial_alphabet: list[str] = field(default_factory=lambda: [])
-    continuing_subword_prefix: Optional[str] = "##"
+    continuing_subword_prefix: str = "##"
     end_of_word_suffix: Optional[str] = None
 
 
@@ -0,0 +1,33 @@
+from dataclasses import field
+
+from hydra.core.config_store import ConfigStore
+from omegaconf import MISSING
+from pydantic.dataclasses import dataclass
+
+from cybulde.config_schemas.infrastructure import gcp_schema
+
+
+@dataclass
+class TokenizeDataConfig:
+    infrastructure: gcp_schema.GCPConfig = gcp_schema.GCPConfig()
+
+    # Holds <split>.parquet files, or <split> directories of shards
+    processed_data_dir: str = MISSING
+    tokenizer_dir: str = MISSING
+    tokenized_data_save_dir: str = MISSING
+    split_names: list[str] = field(default_factory=lambda: ["train", "dev", "test"])
+    text_column_name: str = "cleaned_text"
+    label_column_name: str = "label"
+    # Number of texts per encode_batch call, which encodes them in parallel
+    batch_size: int = 10_000
+    add_special_tokens: bool = True
+
+    docker_image_name: str = MISSING
+    docker_image_tag: str = MISSING
+
+
+def setup_config() -> None:
+    gcp_schema.setup_config()
+
+    cs = ConfigStore.instance()
+    cs.store(name="tokenize_data_config_schema", node=TokenizeDataConfig)
@@ -0,0 +1,39 @@
+from dataclasses import field
+from typing import Optional
+
+from hydra.core.config_store import ConfigStore
+from omegaconf import MISSING
+from pydantic.dataclasses import dataclass
+
+from cybulde.config_schemas.infrastructure import gcp_schema
+from cybulde.config_schemas.tokenization import tokenizer_schema
+from cybulde.config_schemas.tokenizer_training_config_schema import TokenizerSamplingConfig
+
+
+@dataclass
+class TokenizerSweepConfig:
+    infrastructure: gcp_schema.GCPConfig = gcp_schema.GCPConfig()
+
+    data_parquet_path: str = MISSING
+    text_column_name: str = MISSING
+    batch_size: int = 10_000
+    # Shared by all tokenizers, when enabled every tokenizer also gets holdout coverage stats
+    sampling: TokenizerSamplingConfig = TokenizerSamplingConfig()
+
+    # Tokenizers to train by name, each one is saved under <data_parquet_path dir>/tokenizer_sweep/<name>
+    tokenizers: dict[str, tokenizer_schema.TokenizerConfig] = field(default_factory=lambda: {})
+    # Number of tokenizers trained at the same time, defaults to one per available core
+    nrof_workers: Optional[int] = None
+    # The corpus is read once into an Arrow IPC file here, which all workers memory-map
+    corpus_cache_dir: str = "/tmp/tokenizer_sweep_corpus"
+
+    docker_image_name: str = MISSING
+    docker_image_tag: str = MISSING
+
+
+def setup_config() -> None:
+    gcp_schema.setup_config()
+    tokenizer_schema.setup_config()
+
+    cs = ConfigStore.instance()
+    cs.store(name="tokenizer_sweep_config_schema", node=TokenizerSweepConfig)
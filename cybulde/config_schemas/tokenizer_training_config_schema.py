@@ -1,17 +1,51 @@
+from typing import Optional
+
 from hydra.core.config_store import ConfigStore
 from omegaconf import MISSING
 from pydantic.dataclasses import dataclass
 
+from cybulde.config_schemas.dask_cluster import dask_cluster_schema
 from cybulde.config_schemas.infrastructure import gcp_schema
 from cybulde.config_schemas.tokenization import tokenizer_schema
 
 
+@dataclass
+class TokenizerSamplingConfig:
+    # Sampling is enabled by setting one of nrof_samples and sample_fraction
+    nrof_samples: Optional[int] = None
+    sample_fraction: Optional[float] = None
+    # E.g. dataset_name, to sample every dataset in proportion to its number of rows
+    stratify_column_name: Optional[str] = None
+    # Held out texts on which the coverage of the trained tokenizer is reported
+    nrof_holdout_samples: int = 10_000
+    seed: int = 1234
+
+
 @dataclass
 class TokenizerTrainingConfig:
     infrastructure: gcp_schema.GCPConfig = gcp_schema.GCPConfig()
 
     data_parquet_path: str = MISSING
     text_column_name: str = MISSING
+    # Number of texts read per record batch while streaming the training data
+    batch_size: int = 10_000
+
+    # Count the pre-tokenized words with a Dask map-reduce over the parquet partitions and train from the counts.
+    # Normalizing and pre-tokenizing is spread over the workers. The trainer is fed every counted word occurrence,
+    # so more words than word_frequencies_max_nrof_words are first scaled down to it, in proportion to their counts.
+    # Set it to null to train on the exact counts, which is the same as training on the texts.
+    train_from_word_frequencies: bool = False
+    word_frequencies_max_nrof_words: Optional[int] = 2_000_000
+    # Cluster for counting the words, e.g. +dask_cluster=local_dask_cluster. Without it the processes scheduler is used
+    dask_cluster: Optional[dask_cluster_schema.DaskClusterConfig] = None
+
+    # Train on a seeded sample of the texts, e.g. sampling.nrof_samples=1000000
+    sampling: TokenizerSamplingConfig = TokenizerSamplingConfig()
+
+    # Skip training when trained_tokenizer was trained on the same data with the same tokenizer config
+    reuse_cached_tokenizer: bool = True
+    # Save the spans of the training stages to trained_tokenizer, as tokenizer_training_trace.json and its summary
+    save_trace: bool = False
     tokenizer: tokenizer_schema.TokenizerConfig = MISSING
 
     docker_image_name: str = MISSING
@@ -20,6 +54,7 @@ class TokenizerTrainingConfig:
 
 def setup_config() -> None:
     gcp_schema.setup_config()
+    dask_cluster_schema.setup_config()
     tokenizer_schema.setup_config()
 
     cs = ConfigStore.instance()
@@ -2,10 +2,7 @@
 import string
 
 from abc import ABC, abstractmethod
-
-# import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
+from typing import Optional
 
 from cybulde.utils.utils import SpellCorrectionModel
 
@@ -13,6 +10,10 @@
 
 
 class DatasetCleaner(ABC):
+    # False for cleaners that only remove or merge words, i.e. their output never has more words than their input.
+    # Every cleaner must keep a text without any words empty.
+    can_increase_nrof_words: bool = True
+
     def __call__(self, text: str | list[str]) -> str | list[str]:
         if isinstance(text, str):
             return self.clean_text(text)
@@ -37,10 +38,15 @@ def clean_words(self, words: list[str]) -> list[str]:
 class StopWordsDatasetCleaner(DatasetCleaner):
     def __init__(self) -> None:
         super().__init__()
+        # nltk is only imported by the processes which use this cleaner, word_tokenize is pickled by reference
+        from nltk.corpus import stopwords
+        from nltk.tokenize import word_tokenize
+
         self.stopwords = set(stopwords.words("english"))
+        self.word_tokenize = word_tokenize
 
     def clean_text(self, text: str) -> str:
-        cleaned_text = [word for word in word_tokenize(text) if word not in self.stopwords]
+        cleaned_text = [word for word in self.word_tokenize(text) if word not in self.stopwords]
         return " ".join(cleaned_text)
 
     def clean_words(self, words: list[str]) -> list[str]:
@@ -48,6 +54,8 @@ def clean_words(self, words: list[str]) -> list[str]:
 
 
 class ToLowerCaseDatasetCleaner(DatasetCleaner):
+    can_increase_nrof_words = False
+
     def clean_text(self, text: str) -> str:
         return text.lower()
 
@@ -56,6 +64,8 @@ def clean_words(self, words: list[str]) -> list[str]:
 
 
 class URLDatasetCleaner(DatasetCleaner):
+    can_increase_nrof_words = False
+
     def clean_text(self, text: str) -> str:
         return re.sub(r"http\S+", "", text, flags=re.MULTILINE)
 
@@ -64,6 +74,8 @@ def clean_words(self, words: list[str]) -> list[str]:
 
 
 class PunctuationDatasetCleaner(DatasetCleaner):
+    can_increase_nrof_words = False
+
     def __init__(self, punctuation: str = string.punctuation) -> None:
         super().__init__()
         self.table = str.maketrans("", "", punctuation)
@@ -76,6 +88,8 @@ def clean_words(self, words: list[str]) -> list[str]:
 
 
 class NonLettersDatasetCleaner(DatasetCleaner):
+    can_increase_nrof_words = False
+
     def clean_text(self, text: str) -> str:
         return " ".join(self.clean_words(text.split()))
 
@@ -84,6 +98,8 @@ def clean_words(self, words: list[str]) -> list[str]:
 
 
 class NewLineCharacterDatasetCleaner(DatasetCleaner):
+    can_increase_nrof_words = False
+
     def clean_text(self, text: str) -> str:
         return text.replace("\n", "")
 
@@ -92,6 +108,8 @@ def clean_words(self, words: list[str]) -> list[str]:
 
 
 class NonASCIIDatasetCleaner(DatasetCleaner):
+    can_increase_nrof_words = False
+
     def clean_text(self, text: str) -> str:
         return " ".join(self.clean_words(text.split()))
 
@@ -100,6 +118,8 @@ def clean_words(self, words: list[str]) -> list[str]:
 
 
 class ReferenceToAccountDatasetCleaner(DatasetCleaner):
+    can_increase_nrof_words = False
+
     def clean_text(self, text: str) -> str:
         return re.sub(r"@\w+", "", text)
 
@@ -109,6 +129,8 @@ def clean_words(self, words: list[str]) -> list[str]:
 
 
 class ReTweetDatasetCleaner(DatasetCleaner):
+    can_increase_nrof_words = False
+
     def clean_text(self, text: str) -> str:
         return re.sub(
             r"\bRT\b",
@@ -136,6 +158,8 @@ def clean_words(self, words: list[str]) -> list[str]:
 
 
 class CharacterLimiterDatasetCleaner(DatasetCleaner):
+    can_increase_nrof_words = False
+
     def __init__(self, character_limit: int = 300) -> None:
         super().__init__()
         self.character_limit = character_limit
@@ -149,10 +173,49 @@ def clean_words(self, words: list[str]) -> list[str]:
 
 
 class DatasetCleanerManager:
-    def __init__(self, dataset_cleaners: dict[str, DatasetCleaner]) -> None:
+    def __init__(self, dataset_cleaners: dict[str, DatasetCleaner], min_nrof_words: Optional[int] = None) -> None:
         self.dataset_cleaners = dataset_cleaners
+        self.min_nrof_words = min_nrof_words
+        self.nrof_words_checks = self._get_nrof_words_checks()
 
     def __call__(self, text: str | list[str]) -> str | list[str]:
-        for dataset_cleaner in self.dataset_cleaners.values():
+        for dataset_cleaner, nrof_words_check in zip(self.dataset_cleaners.values(), self.nrof_words_checks):
+            if nrof_words_check is not None and self._get_nrof_words(text) < nrof_words_check:
+                # The text is certain to be filtered out by min_nrof_words, skip the remaining cleaners
+                break
             text = dataset_cleaner(text)
         return text
+
+    def _get_nrof_words_checks(self) -> list[Optional[int]]:
+        """
+        For every cleaner, the number of words the text must have before running it so that the cleaned text
+        can still have min_nrof_words words. None means the text is not checked before that cleaner.
+
+        A text without any words stays empty, so it is checked before every cleaner that can increase the number
+        of words, which are also the expensive ones (e.g. stop words and spell correction).
+        Once only cleaners that can't increase the number of words are left, min_nrof_words itself is an upper bound.
+        """
+        dataset_cleaners = list(self.dataset_cleaners.values())
+        nrof_words_checks: list[Optional[int]] = [None] * len(dataset_cleaners)
+        if self.min_nrof_words is None or self.min_nrof_words < 1:
+            return nrof_words_checks
+
+        for idx, dataset_cleaner in enumerate(dataset_cleaners):
+            if dataset_cleaner.can_increase_nrof_words:
+                nrof_words_checks[idx] = 1
+
+        non_increasing_start_idx = len(dataset_cleaners)
+        while non_increasing_start_idx > 0:
+            if dataset_cleaners[non_increasing_start_idx - 1].can_increase_nrof_words:
+                break
+            non_increasing_start_idx -= 1
+        if non_increasing_start_idx < len(dataset_cleaners):
+            nrof_words_checks[non_increasing_start_idx] = self.min_nrof_words
+
+        return nrof_words_checks
+
+    @staticmethod
+    def _get_nrof_words(text: str | list[str]) -> int:
+        if isinstance(text, str):
+            return len(text.split())
+        return sum(len(word.split()) for word in text)
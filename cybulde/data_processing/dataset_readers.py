@@ -1,21 +1,33 @@
 import os
+import time
 
 from abc import ABC, abstractmethod
 from typing import Any, Optional
 
 import dask
 import dask.dataframe as dd
+import pandas as pd
 
 from dask_ml.model_selection import train_test_split
 from dvc.api import get_url
 
-from cybulde.utils.data_utils import get_repo_address_with_access_token, repartition_dataframe
+from cybulde.utils.data_utils import (
+    get_repo_address_with_access_token,
+    get_sample_hashes,
+    repartition_dataframe,
+    sample_rows,
+)
+from cybulde.utils.io_utils import get_file_size, open_file
+from cybulde.utils.tracing_utils import span
 from cybulde.utils.utils import get_logger
 
 
 class DatasetReader(ABC):
     required_columns = {"text", "label", "split", "dataset_name"}
     split_names = {"train", "dev", "test"}
+    # The raw files in dataset_dir with their read_csv arguments, and the column of the texts in them
+    raw_files: dict[str, dict[str, Any]]
+    raw_text_column_name: str
 
     def __init__(
         self,
@@ -34,6 +46,19 @@ def __init__(
             gcp_project_id, gcp_github_access_token_secret_id, dvc_remote_repo, github_user_name
         )
         self.version = version
+        self.sample_fraction: Optional[float] = None
+        self.max_rows: Optional[int] = None
+        self.sample_seed = 1234
+
+    def set_sampling(self, sample_fraction: Optional[float], max_rows: Optional[int], sample_seed: int) -> None:
+        """
+        Read a seeded sample of the rows: sample_fraction of the rows of every raw file, and at most max_rows rows
+        of the dataset after it is split. Both keep the rows with the smallest hashes of their text, so the
+        max_rows rows are a subset of the sample_fraction rows, and the sample doesn't depend on the partitioning.
+        """
+        self.sample_fraction = sample_fraction
+        self.max_rows = max_rows
+        self.sample_seed = sample_seed
 
     def read_data(self) -> dd.core.DataFrame:
         self.logger.info(f"Reading {self.__class__.__name__} dataset ...")
@@ -47,10 +72,25 @@ def read_data(self) -> dd.core.DataFrame:
         if any(required_column not in df.columns.values for required_column in self.required_columns):
             raise ValueError(f"Dataset must contain all required columns: {self.required_columns}")
 
-        print("printing split head")
+        if self.max_rows is not None:
+            # Sampled after splitting, so that the split proportions are kept. Duplicated texts have the same
+            # sample hash, the hash of the whole row breaks these ties, so that exactly max_rows rows are kept.
+            sample_hashes = df["text"].map_partitions(get_sample_hashes, self.sample_seed, meta=("text", "uint64"))
+            row_hashes = df.map_partitions(  # type: ignore[no-untyped-call]
+                pd.util.hash_pandas_object, index=False, meta=(None, "uint64")
+            )
+            df = df.assign(sample_hash=sample_hashes, row_hash=row_hashes)
+            df = df.nsmallest(self.max_rows, ["sample_hash", "row_hash"])
+            # Dropped in the partitions, as dask-expr would push a drop below nsmallest, which then misses the hashes
+            df = df.map_partitions(  # type: ignore[no-untyped-call]
+                pd.DataFrame.drop, columns=["sample_hash", "row_hash"]
+            )
+
+        self.logger.info(f"Checking the split names of the {self.dataset_name} dataset ...")
 
         # unique_split_names = set(df["split"].unique().compute().tolist())
-        unique_split_names = list(dask.compute(df["split"].unique())[0])  # type: ignore
+        with span("compute_split_names", dataset_name=self.dataset_name):
+            unique_split_names = list(dask.compute(df["split"].unique())[0])  # type: ignore
         if sorted(unique_split_names) != sorted(self.split_names):
             raise ValueError(f"Dataset must contain all required split names: {self.split_names}")
         ret_df: dd.core.DataFrame = df[list(self.required_columns)]
@@ -95,12 +135,48 @@ def split_dataset(
 
         return first_df, second_df
 
+    def read_raw_csv(self, file_name: str) -> dd.core.DataFrame:
+        """
+        Read one of the raw files, only the sampled rows with sample_fraction
+        """
+        url = self.get_remote_data_url(os.path.join(self.dataset_dir, file_name))
+        df: dd.core.DataFrame = dd.read_csv(url, **self.raw_files[file_name])
+        # Files without texts (e.g. the Jigsaw test labels) are only joined to the sampled rows of the others
+        if self.sample_fraction is not None and self.raw_text_column_name in df.columns:
+            df = df.map_partitions(  # type: ignore[no-untyped-call]
+                sample_rows, self.raw_text_column_name, self.sample_fraction, self.sample_seed
+            )
+        return df
+
+    def read_raw_sample(self, nrof_rows: int) -> dict[str, dict[str, Any]]:
+        """
+        The size, the first nrof_rows rows and the seconds it took to read them of every raw file, read without dask,
+        e.g. to estimate the size of the whole dataset before processing it
+        """
+        raw_samples = {}
+        for file_name, read_csv_kwargs in self.raw_files.items():
+            url = self.get_remote_data_url(os.path.join(self.dataset_dir, file_name))
+            start_time = time.perf_counter()
+            with open_file(url, "r") as raw_file:
+                sample_df = pd.read_csv(raw_file, nrows=nrof_rows, **read_csv_kwargs)
+            raw_samples[file_name] = {
+                "nrof_bytes": get_file_size(url),
+                "sample_df": sample_df,
+                "read_seconds": time.perf_counter() - start_time,
+                "read_csv_kwargs": read_csv_kwargs,
+            }
+        return raw_samples
+
     def get_remote_data_url(self, dataset_path: str) -> str:
-        ret_url : str = get_url(path=dataset_path, repo=self.dvc_remote_repo, rev=self.version) 
+        with span("resolve_data_url", dataset_path=dataset_path):
+            ret_url: str = get_url(path=dataset_path, repo=self.dvc_remote_repo, rev=self.version)
         return ret_url
 
 
 class GHCDatasetReader(DatasetReader):
+    raw_files = {"ghc_train.tsv": {"sep": "\t", "header": 0}, "ghc_test.tsv": {"sep": "\t", "header": 0}}
+    raw_text_column_name = "text"
+
     def __init__(
         self,
         dataset_dir: str,
@@ -127,15 +203,11 @@ def _read_data(self) -> tuple[dd.core.DataFrame, dd.core.DataFrame, dd.core.Data
         train_df: dd.core.DataFrame
         dev_df: dd.core.DataFrame
         test_df: dd.core.DataFrame
-        train_tsv_path = os.path.join(self.dataset_dir, "ghc_train.tsv")
-        train_tsv_url = self.get_remote_data_url(train_tsv_path)
         # train_df = dd.read_csv(train_tsv_path, sep="\t", header=0)
-        train_df = dd.read_csv(train_tsv_url, sep="\t", header=0)
+        train_df = self.read_raw_csv("ghc_train.tsv")
 
-        test_tsv_path = os.path.join(self.dataset_dir, "ghc_test.tsv")
-        train_tsv_url = self.get_remote_data_url(test_tsv_path)
         # test_df = dd.read_csv(test_tsv_path, sep="\t", header=0)
-        test_df = dd.read_csv(train_tsv_url, sep="\t", header=0)
+        test_df = self.read_raw_csv("ghc_test.tsv")
         train_df["label"] = (train_df["hd"] + train_df["cv"] + train_df["vo"] > 0).astype(int)
         test_df["label"] = (test_df["hd"] + test_df["cv"] + test_df["vo"] > 0).astype(int)
 
@@ -148,6 +220,10 @@ def _read_data(self) -> tuple[dd.core.DataFrame, dd.core.DataFrame, dd.core.Data
 
 
 class JigsawToxicCommentsDatasetReader(DatasetReader):
+    # test_labels.csv only has the labels of test.csv
+    raw_files = {"train.csv": {}, "test.csv": {}, "test_labels.csv": {}}
+    raw_text_column_name = "comment_text"
+
     def __init__(
         self,
         dataset_dir: str,
@@ -172,23 +248,16 @@ def __init__(
         self.columns_for_label = ["toxic", "severe_toxic", "obscene", "threat", "insult", "identity_hate"]
 
     def _read_data(self) -> tuple[dd.core.DataFrame, dd.core.DataFrame, dd.core.DataFrame]:
-        test_csv_path = os.path.join(self.dataset_dir, "test.csv")
-        test_csv_url = self.get_remote_data_url(test_csv_path)
-        test_df = dd.read_csv(test_csv_url)
+        test_df = self.read_raw_csv("test.csv")
+        test_labels_df = self.read_raw_csv("test_labels.csv")
 
-        test_labels_csv_path = os.path.join(self.dataset_dir, "test_labels.csv")
-        test_labels_csv_url = self.get_remote_data_url(test_labels_csv_path)
-        test_labels_df = dd.read_csv(test_labels_csv_url)
-
-        test_df = test_df.merge(test_labels_df, on=["id"])
+        test_df = test_df.merge(test_labels_df, on=["id"])  # type: ignore[no-untyped-call]
         test_df = test_df[test_df["toxic"] != -1]
 
         test_df = self.get_text_and_label_columns(test_df)
         to_train_df, test_df = self.split_dataset(test_df, 0.1, stratify_column="label")
 
-        train_csv_path = os.path.join(self.dataset_dir, "train.csv")
-        train_csv_url = self.get_remote_data_url(train_csv_path)
-        train_df = dd.read_csv(train_csv_url)
+        train_df = self.read_raw_csv("train.csv")
         train_df = self.get_text_and_label_columns(train_df)
         train_df = dd.concat([train_df, to_train_df]) # type: ignore
 
@@ -203,6 +272,9 @@ def get_text_and_label_columns(self, df: dd.core.DataFrame) -> dd.core.DataFrame
 
 
 class TwitterCommentsDatasetReader(DatasetReader):
+    raw_files = {"cyberbullying_tweets.csv": {}}
+    raw_text_column_name = "tweet_text"
+
     def __init__(
         self,
         dataset_dir: str,
@@ -228,11 +300,8 @@ def __init__(
         self.test_split_ratio: float = test_split_ratio
 
     def _read_data(self) -> tuple[dd.core.DataFrame, dd.core.DataFrame, dd.core.DataFrame]:
-        data_csv_path = os.path.join(self.dataset_dir, "cyberbullying_tweets.csv")
-        data_csv_url = self.get_remote_data_url(data_csv_path)
-
         # df = dd.read_csv(data_csv_path)
-        df = dd.read_csv(data_csv_url)
+        df = self.read_raw_csv("cyberbullying_tweets.csv")
         df = df.rename(columns={"tweet_text": "text", "cyberbullying_type": "label"})
 
         # df['label'] = df.apply(self.get_label_values, axis=1, meta=float)
@@ -264,15 +333,29 @@ def __init__(
         dataset_readers: dict[str, DatasetReader],
         repartition: bool = True,
         available_memory: Optional[float] = None,
+        sample_fraction: Optional[float] = None,
+        max_rows_per_dataset: Optional[int] = None,
+        sample_seed: int = 1234,
     ) -> None:
+        if sample_fraction is not None and not 0 < sample_fraction <= 1:
+            raise ValueError(f"sample_fraction must be in (0, 1], got: {sample_fraction}")
+        if max_rows_per_dataset is not None and max_rows_per_dataset < 1:
+            raise ValueError(f"max_rows_per_dataset must be at least 1, got: {max_rows_per_dataset}")
+
         self.dataset_readers = dataset_readers
         self.repartition = repartition
         self.available_memory = available_memory
+        for dataset_reader in self.dataset_readers.values():
+            dataset_reader.set_sampling(sample_fraction, max_rows_per_dataset, sample_seed)
 
     def read_data(self, nrof_workers: int) -> dd.core.DataFrame:
         # print (len(self.dataset_readers.values()))
-        dfs = [dataset_reader.read_data() for dataset_reader in self.dataset_readers.values()]
+        dfs = []
+        for dataset_reader in self.dataset_readers.values():
+            with span("read_dataset", dataset_name=dataset_reader.dataset_name):
+                dfs.append(dataset_reader.read_data())
         df: dd.core.DataFrame = dd.concat(dfs)  # type: ignore
         if self.repartition:
-            df = repartition_dataframe(df, nrof_workers=nrof_workers, available_memory=self.available_memory)
+            with span("repartition", nrof_workers=nrof_workers):
+                df = repartition_dataframe(df, nrof_workers=nrof_workers, available_memory=self.available_memory)
         return df
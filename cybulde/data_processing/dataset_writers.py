@@ -0,0 +1,275 @@
+import os
+import time
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from cybulde.utils.data_utils import shuffle_with_hash_key
+from cybulde.utils.io_utils import make_dirs, open_file, write_yaml_file
+from cybulde.utils.tracing_utils import span
+from cybulde.utils.utils import get_logger
+
+
+class DatasetWriter(ABC):
+    file_extension: str
+    arrow_ipc_file_extension = ".arrow"
+    file_stats_file_name = "output_file_stats.yaml"
+    manifest_file_name = "_manifest.yaml"
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        upload_block_size: Optional[int] = None,
+        nrof_shards: Optional[int] = None,
+        shuffle_seed: int = 1234,
+        write_arrow_ipc: bool = False,
+    ) -> None:
+        if nrof_shards is not None and nrof_shards < 1:
+            raise ValueError(f"nrof_shards must be at least 1, got: {nrof_shards}")
+
+        self.logger = get_logger(self.__class__.__name__)
+        self.max_workers = max_workers
+        self.upload_block_size = upload_block_size
+        self.nrof_shards = nrof_shards
+        self.shuffle_seed = shuffle_seed
+        self.write_arrow_ipc = write_arrow_ipc
+
+    def write_splits(
+        self,
+        split_dfs: dict[str, pd.DataFrame],
+        save_dir: str,
+        yaml_files: Optional[dict[str, dict[Any, Any]]] = None,
+    ) -> None:
+        """
+        Serialize and upload the split files, and the given yaml files (file name -> content), concurrently.
+        Serialization releases the GIL and uploads wait on the network, so threads are enough.
+        """
+        if yaml_files is None:
+            yaml_files = {}
+
+        split_files = {
+            split_name: self.get_split_files(df, save_dir, split_name) for split_name, df in split_dfs.items()
+        }
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            file_futures = {
+                split_name: [executor.submit(self.write_file, df, path) for path, df in files]
+                for split_name, files in split_files.items()
+            }
+            yaml_futures = [
+                executor.submit(self.write_yaml_file, os.path.join(save_dir, file_name), content)
+                for file_name, content in yaml_files.items()
+            ]
+            file_stats = {
+                split_name: [future.result() for future in futures] for split_name, futures in file_futures.items()
+            }
+            for future in yaml_futures:
+                future.result()
+
+        if self.nrof_shards is not None:
+            for split_name, files in split_files.items():
+                self.write_manifest(os.path.join(save_dir, split_name), files, file_stats[split_name])
+
+        self.write_yaml_file(os.path.join(save_dir, self.file_stats_file_name), file_stats)
+
+    def get_split_files(self, df: pd.DataFrame, save_dir: str, split_name: str) -> list[tuple[str, pd.DataFrame]]:
+        """
+        Returns (path, data frame) pairs of the files to write for the given split.
+        Without shards this is a single file, otherwise the split is shuffled and cut into nrof_shards
+        shards with (almost) the same number of rows under save_dir/split_name.
+        """
+        if self.nrof_shards is None:
+            return [(os.path.join(save_dir, f"{split_name}{self.file_extension}"), df)]
+
+        make_dirs(os.path.join(save_dir, split_name))
+        df = shuffle_with_hash_key(df, self.shuffle_seed)
+        shard_boundaries = [shard_idx * len(df) // self.nrof_shards for shard_idx in range(self.nrof_shards + 1)]
+        return [
+            (
+                os.path.join(save_dir, split_name, f"part-{shard_idx:05d}{self.file_extension}"),
+                df.iloc[shard_boundaries[shard_idx] : shard_boundaries[shard_idx + 1]],
+            )
+            for shard_idx in range(self.nrof_shards)
+        ]
+
+    def write_file(self, df: pd.DataFrame, path: str) -> dict[str, Any]:
+        self.logger.info(f"Writing {len(df)} rows to: {path}")
+        start_time = time.perf_counter()
+        with span("serialize", path=path, nrof_rows=len(df)):
+            table = self.get_table(df)
+            content = self.serialize(table)
+        serialization_seconds = time.perf_counter() - start_time
+        with span("upload", path=path, nrof_bytes=content.size):
+            upload_seconds = self.upload(path, content)
+        self.logger.info(f"{path}: serialized in {serialization_seconds:.3f}s, uploaded in {upload_seconds:.3f}s")
+
+        file_stats = self.get_file_stats(path, content)
+        file_stats["serialization_seconds"] = round(serialization_seconds, 3)
+        file_stats["upload_seconds"] = round(upload_seconds, 3)
+
+        if self.write_arrow_ipc:
+            arrow_ipc_path = os.path.splitext(path)[0] + self.arrow_ipc_file_extension
+            arrow_ipc_content = self.serialize_arrow_ipc(table)
+            arrow_ipc_upload_seconds = self.upload(arrow_ipc_path, arrow_ipc_content)
+            self.logger.info(f"{arrow_ipc_path}: uploaded in {arrow_ipc_upload_seconds:.3f}s")
+            file_stats["arrow_ipc"] = {
+                "path": arrow_ipc_path,
+                "nrof_bytes": arrow_ipc_content.size,
+                "upload_seconds": round(arrow_ipc_upload_seconds, 3),
+            }
+
+        return file_stats
+
+    def get_table(self, df: pd.DataFrame) -> pa.Table:
+        # The index only holds the row positions of the raw files, so it is not written
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+    def serialize_arrow_ipc(self, table: pa.Table) -> pa.Buffer:
+        """
+        Uncompressed Arrow IPC (Feather v2) content, which can be memory-mapped without copying,
+        see cybulde.utils.arrow_utils.load_arrow_ipc
+        """
+        output_stream = pa.BufferOutputStream()
+        feather.write_feather(table, output_stream, compression="uncompressed")
+        content: pa.Buffer = output_stream.getvalue()
+        return content
+
+    def write_manifest(
+        self, split_dir: str, files: list[tuple[str, pd.DataFrame]], file_stats: list[dict[str, Any]]
+    ) -> None:
+        shards = []
+        for (path, df), stats in zip(files, file_stats):
+            label_counts = df["label"].value_counts().sort_index()
+            shards.append(
+                {
+                    "path": path,
+                    "nrof_rows": len(df),
+                    "nrof_bytes": stats["nrof_bytes"],
+                    "label_distribution": {int(label): int(count) for label, count in label_counts.items()},
+                }
+            )
+        manifest = {
+            "nrof_shards": len(shards),
+            "nrof_rows": sum(shard["nrof_rows"] for shard in shards),
+            "shuffle_seed": self.shuffle_seed,
+            "shards": shards,
+        }
+        self.write_yaml_file(os.path.join(split_dir, self.manifest_file_name), manifest)
+
+    def write_yaml_file(self, yaml_file_path: str, yaml_file_content: dict[Any, Any]) -> None:
+        start_time = time.perf_counter()
+        write_yaml_file(yaml_file_path, yaml_file_content)
+        self.logger.info(f"Wrote {yaml_file_path} in {time.perf_counter() - start_time:.3f}s")
+
+    def upload(self, path: str, content: pa.Buffer) -> float:
+        """
+        Upload content to path and return the elapsed seconds.
+        upload_block_size sets the part size of multipart (resumable) uploads on object stores.
+        """
+        start_time = time.perf_counter()
+        with open_file(path, "wb", block_size=self.upload_block_size) as f:
+            f.write(content)
+        return time.perf_counter() - start_time
+
+    @abstractmethod
+    def serialize(self, table: pa.Table) -> pa.Buffer:
+        """
+        Serialize the given table into the content of a single output file
+        """
+        pass
+
+    @abstractmethod
+    def get_file_stats(self, path: str, content: pa.Buffer) -> dict[str, Any]:
+        """
+        Statistics of a written file, given its path and content
+        """
+        pass
+
+
+class ParquetDatasetWriter(DatasetWriter):
+    file_extension = ".parquet"
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        upload_block_size: Optional[int] = None,
+        nrof_shards: Optional[int] = None,
+        shuffle_seed: int = 1234,
+        write_arrow_ipc: bool = False,
+        row_group_size: Optional[int] = 100_000,
+        compression: str = "snappy",
+        compression_level: Optional[int] = None,
+        dictionary_columns: Optional[list[str]] = None,
+        sort_columns: Optional[list[str]] = None,
+        write_statistics: bool = True,
+    ) -> None:
+        super().__init__(max_workers, upload_block_size, nrof_shards, shuffle_seed, write_arrow_ipc)
+        if sort_columns and nrof_shards is not None:
+            raise ValueError("sort_columns can't be used together with nrof_shards, shards are shuffled")
+
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.compression_level = compression_level
+        self.dictionary_columns = dictionary_columns
+        self.sort_columns = sort_columns
+        self.write_statistics = write_statistics
+
+    def get_table(self, df: pd.DataFrame) -> pa.Table:
+        if self.sort_columns:
+            df = df.sort_values(self.sort_columns, kind="stable")
+        return super().get_table(df)
+
+    def serialize(self, table: pa.Table) -> pa.Buffer:
+        output_stream = pa.BufferOutputStream()
+        pq.write_table(
+            table,
+            output_stream,
+            row_group_size=self.row_group_size,
+            compression=self.compression,
+            compression_level=self.compression_level,
+            use_dictionary=True if self.dictionary_columns is None else self.dictionary_columns,
+            write_statistics=self.write_statistics,
+        )
+        content: pa.Buffer = output_stream.getvalue()
+        return content
+
+    def get_file_stats(self, path: str, content: pa.Buffer) -> dict[str, Any]:
+        metadata = pq.read_metadata(pa.BufferReader(content))
+
+        column_stats: dict[str, dict[str, int]] = {}
+        row_group_stats = []
+        for row_group_idx in range(metadata.num_row_groups):
+            row_group = metadata.row_group(row_group_idx)
+            sort_column_ranges = {}
+            for column_idx in range(row_group.num_columns):
+                column = row_group.column(column_idx)
+                stats = column_stats.setdefault(column.path_in_schema, {"compressed_bytes": 0, "uncompressed_bytes": 0})
+                stats["compressed_bytes"] += column.total_compressed_size
+                stats["uncompressed_bytes"] += column.total_uncompressed_size
+                if self.sort_columns and column.path_in_schema in self.sort_columns and column.is_stats_set:
+                    sort_column_ranges[column.path_in_schema] = {
+                        "min": column.statistics.min,
+                        "max": column.statistics.max,
+                    }
+            row_group_stats.append({"nrof_rows": row_group.num_rows, "sort_column_ranges": sort_column_ranges})
+
+        file_stats = {
+            "path": path,
+            "nrof_bytes": content.size,
+            "nrof_rows": metadata.num_rows,
+            "nrof_row_groups": metadata.num_row_groups,
+            "compression": self.compression,
+            "columns": column_stats,
+            "row_groups": row_group_stats,
+        }
+        self.logger.info(
+            f"Wrote {path}: {file_stats['nrof_bytes']} bytes, "
+            f"{file_stats['nrof_rows']} rows, {file_stats['nrof_row_groups']} row groups"
+        )
+        return file_stats
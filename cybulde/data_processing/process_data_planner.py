@@ -0,0 +1,333 @@
+import time
+
+from typing import Any, Optional
+
+import pandas as pd
+import psutil
+
+from cybulde.config_schemas.dask_cluster.dask_cluster_schema import (
+    DaskClusterConfig,
+    GCPDaskClusterConfig,
+    LocalDaskClusterConfig,
+)
+from cybulde.data_processing.dataset_cleaners import DatasetCleanerManager
+from cybulde.data_processing.dataset_readers import DatasetReader, DatasetReaderManager
+from cybulde.data_processing.dataset_writers import DatasetWriter
+from cybulde.utils.dask_utils import get_nrof_workers
+from cybulde.utils.data_utils import (
+    AIMED_NROF_PARTITIONS_PER_WORKER,
+    MIN_PARTITION_SIZE,
+    add_text_statistics_columns,
+    filter_based_on_minimum_number_of_words,
+    get_nrof_partitions,
+)
+
+# Memory of the GCP machine types, in bytes like available_memory in running_mode/n1_standard_1.yaml
+GCP_MACHINE_TYPE_MEMORY = {
+    "n1-standard-1": 3.75e9,
+    "n1-standard-2": 7.5e9,
+    "n1-standard-4": 15e9,
+    "n1-standard-8": 30e9,
+    "n1-standard-16": 60e9,
+    "n1-highmem-2": 13e9,
+    "n1-highmem-4": 26e9,
+    "n1-highmem-8": 52e9,
+    "e2-standard-2": 8e9,
+    "e2-standard-4": 16e9,
+    "e2-standard-8": 32e9,
+    "e2-highmem-2": 16e9,
+    "e2-highmem-4": 32e9,
+    "n2-standard-2": 8e9,
+    "n2-standard-4": 16e9,
+    "n2-standard-8": 32e9,
+}
+
+# Rough seconds until the workers of a new cluster run tasks: local worker processes are spawned and import the
+# cleaners, GCPCluster boots the scheduler VM and then the worker VMs, which pull the docker image
+LOCAL_PROCESSES_CLUSTER_START_SECONDS = 5.0
+LOCAL_THREADS_CLUSTER_START_SECONDS = 1.0
+GCP_VM_START_SECONDS = 180.0
+
+
+def get_dataset_estimate(dataset_reader: DatasetReader, nrof_sample_rows: int) -> tuple[dict[str, Any], pd.DataFrame]:
+    """
+    Number of rows and in-memory size of a dataset, extrapolated from the first nrof_sample_rows rows of its raw files
+    to their size, how long resolving the DVC urls and reading the sample took, and the sampled rows with the columns
+    read_data returns.
+    Rows dropped by the reader (e.g. the unlabeled Jigsaw test rows) are counted, so this is an upper bound.
+    """
+    start_time = time.perf_counter()
+    raw_samples = dataset_reader.read_raw_sample(nrof_sample_rows)
+    sample_read_seconds = sum(raw_sample["read_seconds"] for raw_sample in raw_samples.values())
+    url_resolution_seconds = time.perf_counter() - start_time - sample_read_seconds
+    nrof_rows = 0
+    nrof_sampled_raw_bytes = 0
+    texts = []
+    for raw_sample in raw_samples.values():
+        raw_df = raw_sample["sample_df"]
+        if len(raw_df) == 0:
+            continue
+        # The sampled rows in the format of the raw file, for the read rate and the number of raw bytes per row
+        raw_sample_nrof_bytes = len(
+            raw_df.to_csv(index=False, header=False, sep=raw_sample["read_csv_kwargs"].get("sep", ",")).encode("utf-8")
+        )
+        nrof_sampled_raw_bytes += raw_sample_nrof_bytes
+        # Files without texts (e.g. the Jigsaw test labels) are only joined to the others
+        if dataset_reader.raw_text_column_name not in raw_df.columns:
+            continue
+        nrof_rows += round(raw_sample["nrof_bytes"] * len(raw_df) / raw_sample_nrof_bytes)
+        texts.append(raw_df[dataset_reader.raw_text_column_name])
+
+    sample_df = pd.DataFrame(
+        {
+            # Empty raw files (or plan_nrof_sample_rows 0) leave no rows to extrapolate from
+            "text": pd.concat(texts, ignore_index=True) if texts else pd.Series([], dtype=object),
+            "label": 0,
+            "split": "train",
+            "dataset_name": dataset_reader.dataset_name,
+        }
+    )
+    in_memory_bytes_per_row = float(sample_df.memory_usage(deep=True).sum()) / max(len(sample_df), 1)
+    dataset_estimate = {
+        "nrof_raw_bytes": sum(raw_sample["nrof_bytes"] for raw_sample in raw_samples.values()),
+        "nrof_sampled_raw_bytes": nrof_sampled_raw_bytes,
+        "sample_read_seconds": round(sample_read_seconds, 3),
+        "url_resolution_seconds": round(url_resolution_seconds, 3),
+        "nrof_sampled_rows": len(sample_df),
+        "nrof_rows": nrof_rows,
+        "nrof_bytes_in_memory": round(nrof_rows * in_memory_bytes_per_row),
+    }
+    return dataset_estimate, sample_df
+
+
+def get_cleaning_estimate(
+    dataset_cleaner_manager: DatasetCleanerManager, sample_df: pd.DataFrame, min_nrof_words: int
+) -> tuple[dict[str, Any], pd.DataFrame]:
+    """
+    Time the cleaner chain on the sampled rows, like process_raw_data does on a partition,
+    and return the cleaned rows which are kept
+    """
+    if len(sample_df) == 0:
+        return {
+            "setup_seconds": 0.0,
+            "seconds_per_row": 0.0,
+            "kept_fraction": 0.0,
+            "output_bytes_per_row": 0.0,
+        }, sample_df
+
+    # The first text loads the resources of the cleaners (e.g. the spell correction dictionary), on every worker
+    start_time = time.perf_counter()
+    dataset_cleaner_manager(sample_df["text"].iloc[0])
+    setup_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    cleaned_df = sample_df.assign(cleaned_text=sample_df["text"].apply(dataset_cleaner_manager))
+    cleaning_seconds = time.perf_counter() - start_time
+    cleaned_df = add_text_statistics_columns(cleaned_df, text_column_name="cleaned_text")
+
+    kept_df = filter_based_on_minimum_number_of_words(cleaned_df, min_nrof_words)
+    cleaning_estimate = {
+        "setup_seconds": round(setup_seconds, 3),
+        "seconds_per_row": cleaning_seconds / len(sample_df),
+        "kept_fraction": round(len(kept_df) / len(sample_df), 4),
+        "output_bytes_per_row": round(float(cleaned_df.memory_usage(deep=True).sum()) / len(sample_df), 1),
+    }
+    return cleaning_estimate, kept_df
+
+
+def get_writing_estimate(dataset_writer: DatasetWriter, kept_df: pd.DataFrame) -> dict[str, Any]:
+    """
+    Size and serialization time of the kept rows in the format of the dataset writer, like write_file does on a split
+    """
+    if len(kept_df) == 0:
+        return {"serialized_bytes_per_row": 0.0, "serialization_seconds_per_row": 0.0}
+
+    start_time = time.perf_counter()
+    content = dataset_writer.serialize(dataset_writer.get_table(kept_df))
+    serialization_seconds = time.perf_counter() - start_time
+    return {
+        "serialized_bytes_per_row": round(content.size / len(kept_df), 1),
+        "serialization_seconds_per_row": serialization_seconds / len(kept_df),
+    }
+
+
+def get_worker_resources(dask_cluster_config: DaskClusterConfig) -> dict[str, Any]:
+    """
+    Threads and memory of a worker, and whether the workers are separate processes, which run the cleaners in parallel.
+    The cleaners are pure Python, so the threads of a worker process hold the GIL in turn and clean one row at a time.
+    """
+    if isinstance(dask_cluster_config, GCPDaskClusterConfig):
+        machine_type = dask_cluster_config.machine_type
+        # The suffix of the standard and highmem machine types is their number of vCPUs
+        nrof_vcpus = int(machine_type.rsplit("-", 1)[-1]) if machine_type.rsplit("-", 1)[-1].isdigit() else 1
+        return {
+            "machine_type": machine_type,
+            "nrof_threads": dask_cluster_config.worker_options.get("nthreads", nrof_vcpus),
+            "memory_bytes": GCP_MACHINE_TYPE_MEMORY.get(machine_type),
+            "parallel": True,
+        }
+
+    if isinstance(dask_cluster_config, LocalDaskClusterConfig):
+        from dask.utils import parse_bytes
+
+        if dask_cluster_config.memory_limit == "auto":
+            memory_bytes: Optional[float] = psutil.virtual_memory().total / dask_cluster_config.n_workers
+        else:
+            memory_bytes = parse_bytes(dask_cluster_config.memory_limit)
+        return {
+            "machine_type": "local",
+            "nrof_threads": dask_cluster_config.threads_per_worker,
+            "memory_bytes": memory_bytes,
+            # With processes=False all workers are threads of this process
+            "parallel": dask_cluster_config.processes,
+        }
+
+    return {"machine_type": None, "nrof_threads": 1, "memory_bytes": None, "parallel": True}
+
+
+def get_cluster_start_seconds(dask_cluster_config: DaskClusterConfig) -> float:
+    """
+    Rough time until a new cluster of dask_cluster_config runs tasks, none if the run attaches to a running scheduler
+    """
+    if dask_cluster_config.scheduler_address is not None:
+        return 0.0
+    if isinstance(dask_cluster_config, GCPDaskClusterConfig):
+        # The worker VMs are created once the scheduler VM is up
+        return 2 * GCP_VM_START_SECONDS
+    if isinstance(dask_cluster_config, LocalDaskClusterConfig) and not dask_cluster_config.processes:
+        return LOCAL_THREADS_CLUSTER_START_SECONDS
+    return LOCAL_PROCESSES_CLUSTER_START_SECONDS
+
+
+def get_process_data_plan(
+    dataset_reader_manager: DatasetReaderManager,
+    dataset_cleaner_manager: DatasetCleanerManager,
+    dataset_writer: DatasetWriter,
+    dask_cluster_config: DaskClusterConfig,
+    min_nrof_words: int,
+    nrof_sample_rows: int,
+) -> dict[str, Any]:
+    """
+    Estimate the size, partitions, memory and wall time of process_data from a sample of every dataset,
+    without starting the cluster. The wall time adds up starting the cluster, reading the raw files, cleaning,
+    serializing and uploading the splits, each from the time it took on the sample.
+    """
+    datasets = {}
+    sample_dfs = []
+    for dataset_reader in dataset_reader_manager.dataset_readers.values():
+        datasets[dataset_reader.dataset_name], sample_df = get_dataset_estimate(dataset_reader, nrof_sample_rows)
+        sample_dfs.append(sample_df)
+    cleaning, kept_df = get_cleaning_estimate(
+        dataset_cleaner_manager, pd.concat(sample_dfs, ignore_index=True), min_nrof_words
+    )
+    writing = get_writing_estimate(dataset_writer, kept_df)
+    worker = get_worker_resources(dask_cluster_config)
+    nrof_workers = get_nrof_workers(dask_cluster_config)
+
+    nrof_rows = sum(dataset["nrof_rows"] for dataset in datasets.values())
+    nrof_output_rows = round(nrof_rows * cleaning["kept_fraction"])
+    nrof_bytes_in_memory = sum(dataset["nrof_bytes_in_memory"] for dataset in datasets.values())
+    if dataset_reader_manager.repartition:
+        nrof_partitions = get_nrof_partitions(
+            nrof_bytes_in_memory,
+            nrof_workers,
+            dataset_reader_manager.available_memory,
+            MIN_PARTITION_SIZE,
+            AIMED_NROF_PARTITIONS_PER_WORKER,
+        )
+    else:
+        # One partition per raw file, as long as the files are smaller than the read_csv block size
+        nrof_partitions = sum(
+            len(dataset_reader.raw_files) for dataset_reader in dataset_reader_manager.dataset_readers.values()
+        )
+    nrof_partitions = max(nrof_partitions, 1)
+
+    output_nrof_bytes = nrof_rows * cleaning["output_bytes_per_row"]
+    partition_nrof_bytes = nrof_bytes_in_memory / nrof_partitions
+    cleaned_partition_nrof_bytes = output_nrof_bytes / nrof_partitions
+    # One cleaning slot per worker process, the threads of a process share its GIL
+    nrof_parallel_workers = max(nrof_workers, 1) if worker["parallel"] else 1
+
+    # Reading the sample parses the rows, like the workers do for the whole files. For small samples of remote files
+    # the rate is latency bound, so the read time is rather overestimated.
+    nrof_sampled_raw_bytes = sum(dataset["nrof_sampled_raw_bytes"] for dataset in datasets.values())
+    sample_read_seconds = sum(dataset["sample_read_seconds"] for dataset in datasets.values())
+    read_bytes_per_second = (
+        nrof_sampled_raw_bytes / sample_read_seconds if nrof_sampled_raw_bytes > 0 and sample_read_seconds > 0 else None
+    )
+    nrof_raw_bytes = sum(dataset["nrof_raw_bytes"] for dataset in datasets.values())
+    nrof_raw_files = sum(
+        len(dataset_reader.raw_files) for dataset_reader in dataset_reader_manager.dataset_readers.values()
+    )
+    # The raw files are read to check the split names of every dataset, to size the partitions when repartitioning,
+    # and then to clean them. Their DVC urls are resolved once, one after the other on the driver.
+    nrof_raw_reads = 3 if dataset_reader_manager.repartition else 2
+    read_seconds = sum(dataset["url_resolution_seconds"] for dataset in datasets.values())
+    if read_bytes_per_second is not None:
+        read_seconds += (
+            nrof_raw_reads * nrof_raw_bytes / read_bytes_per_second / min(nrof_parallel_workers, max(nrof_raw_files, 1))
+        )
+
+    # The driver serializes the split files in max_workers threads, pyarrow releases the GIL while doing so
+    nrof_output_files = 3 * (dataset_writer.nrof_shards or 1)
+    serialized_nrof_bytes = nrof_output_rows * writing["serialized_bytes_per_row"]
+    serialization_seconds = (
+        nrof_output_rows * writing["serialization_seconds_per_row"] / min(dataset_writer.max_workers, nrof_output_files)
+    )
+    # The uploads share the bandwidth of the driver, taken to be the rate the sample was read at
+    upload_seconds = serialized_nrof_bytes / read_bytes_per_second if read_bytes_per_second is not None else 0.0
+
+    cluster_start_seconds = get_cluster_start_seconds(dask_cluster_config)
+    cleaning_seconds = cleaning["setup_seconds"] + nrof_rows * cleaning["seconds_per_row"] / nrof_parallel_workers
+
+    estimates = {
+        "nrof_rows": nrof_rows,
+        "nrof_output_rows": nrof_output_rows,
+        "nrof_bytes_in_memory": nrof_bytes_in_memory,
+        "nrof_partitions": nrof_partitions,
+        "partition_nrof_bytes": round(partition_nrof_bytes),
+        "serialized_nrof_bytes": round(serialized_nrof_bytes),
+        # Every thread cleans a partition, and the cleaned partitions wait on the workers until the driver gathers them
+        "worker_peak_memory_bytes": round(
+            worker["nrof_threads"] * (partition_nrof_bytes + cleaned_partition_nrof_bytes)
+            + output_nrof_bytes / max(nrof_workers, 1)
+        ),
+        # The driver holds the gathered data frame and the filtered splits copied from it
+        "driver_peak_memory_bytes": round(output_nrof_bytes * (1 + cleaning["kept_fraction"])),
+        "cluster_start_seconds": round(cluster_start_seconds, 1),
+        "read_seconds": round(read_seconds, 1),
+        "cleaning_seconds": round(cleaning_seconds, 1),
+        "serialization_seconds": round(serialization_seconds, 1),
+        "upload_seconds": round(upload_seconds, 1),
+        "wall_seconds": round(
+            cluster_start_seconds + read_seconds + cleaning_seconds + serialization_seconds + upload_seconds, 1
+        ),
+    }
+
+    warnings = []
+    if nrof_rows == 0:
+        warnings.append(
+            f"No rows were sampled from the raw files with plan_nrof_sample_rows={nrof_sample_rows}, "
+            "the size, read, cleaning and write estimates are zero"
+        )
+    if worker["memory_bytes"] is not None and estimates["worker_peak_memory_bytes"] > worker["memory_bytes"]:
+        warnings.append(
+            f"The estimated peak memory of a worker ({estimates['worker_peak_memory_bytes']} bytes) is more than "
+            f"the {worker['memory_bytes']} bytes of a {worker['machine_type']} worker, expect spilling or restarts"
+        )
+    if estimates["driver_peak_memory_bytes"] > psutil.virtual_memory().available:
+        warnings.append(
+            f"The estimated peak memory of the driver ({estimates['driver_peak_memory_bytes']} bytes) is more than "
+            "the available memory of this machine"
+        )
+    if nrof_partitions < nrof_parallel_workers:
+        warnings.append(f"{nrof_partitions} partitions can't keep {nrof_parallel_workers} worker processes busy")
+
+    return {
+        "datasets": datasets,
+        "cleaning": {**cleaning, "seconds_per_row": round(cleaning["seconds_per_row"], 6)},
+        "writing": {**writing, "serialization_seconds_per_row": round(writing["serialization_seconds_per_row"], 6)},
+        "cluster": {"nrof_workers": nrof_workers, **worker},
+        "estimates": estimates,
+        "warnings": warnings,
+    }
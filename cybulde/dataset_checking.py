@@ -12,3 +12,4 @@
 print(test_df.columns.values)
 samples_per_dataset = test_df.groupby("dataset_name").size()
 print(samples_per_dataset)
+print(test_df.groupby("dataset_name")[["nrof_words", "nrof_chars", "nrof_bytes"]].describe())
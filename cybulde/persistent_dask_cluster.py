@@ -0,0 +1,87 @@
+import argparse
+
+from pathlib import Path
+from typing import Any
+
+from dask.distributed import Client, Event, WorkerPlugin
+from hydra.utils import instantiate
+
+from cybulde.config_schemas.data_processing_config_schema import DataProcessingConfig
+from cybulde.data_processing.dataset_cleaners import DatasetCleanerManager
+from cybulde.utils.config_utils import get_pickle_config, setup_logger
+from cybulde.utils.dask_utils import create_dask_cluster
+from cybulde.utils.utils import get_logger
+
+WARM_UP_TEXT = "warm up the dataset cleaners"
+# Set on the scheduler by stop_dask_cluster, the process which started the cluster then closes it
+STOP_EVENT_NAME = "stop-persistent-dask-cluster"
+
+
+class DatasetCleanerWarmUpPlugin(WorkerPlugin):
+    """
+    Sends the dataset cleaner manager to every worker, also the ones which join later. Unpickling and calling it
+    loads the cleaner resources (e.g. the spell correction dictionaries), which the worker then keeps between runs.
+    """
+
+    name = "dataset-cleaner-warm-up"
+
+    def __init__(self, dataset_cleaner_manager: DatasetCleanerManager) -> None:
+        self.dataset_cleaner_manager = dataset_cleaner_manager
+
+    def setup(self, worker: Any) -> None:
+        self.dataset_cleaner_manager(WARM_UP_TEXT)
+
+
+@get_pickle_config(config_path="cybulde/configs/automatically_generated", config_name="data_processing_config")  # type: ignore
+def start_dask_cluster(config: DataProcessingConfig) -> None:
+    """
+    Create the cluster of config.dask_cluster and keep it running until it is stopped, so that process_data runs
+    with dask_cluster.scheduler_address set skip starting the workers and loading the cleaner resources
+    """
+    logger = get_logger(Path(__file__).name)
+    logger.info(f"Starting a persistent {config.dask_cluster._target_}...")
+    cluster = create_dask_cluster(config.dask_cluster)
+    client = Client(cluster)  # type: ignore[no-untyped-call]
+    try:
+        client.register_plugin(DatasetCleanerWarmUpPlugin(instantiate(config.dataset_cleaner_manager)))
+        logger.info(
+            f"Dask cluster is running, use dask_cluster.scheduler_address={cluster.scheduler_address} "
+            f"(dashboard: {cluster.dashboard_link}), stop it with persistent_dask_cluster.py stop"
+        )
+        stop_event = Event(STOP_EVENT_NAME, client)  # type: ignore[no-untyped-call]
+        while not stop_event.wait(timeout=1):  # type: ignore[no-untyped-call]
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("closing dask client and cluster...")
+        client.close()  # type: ignore[no-untyped-call]
+        cluster.close()
+
+
+def stop_dask_cluster(scheduler_address: str) -> None:
+    """
+    Ask the process which started the cluster at scheduler_address to close it, which also deletes cloud workers
+    """
+    setup_logger()
+    logger = get_logger(Path(__file__).name)
+    logger.info(f"Stopping the dask cluster at {scheduler_address}...")
+    with Client(scheduler_address) as client:  # type: ignore[no-untyped-call]
+        Event(STOP_EVENT_NAME, client).set()  # type: ignore[no-untyped-call]
+
+
+def persistent_dask_cluster_args_parser() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("start", help="Start the cluster of the data processing config and wait until it is stopped")
+    stop_parser = subparsers.add_parser("stop", help="Stop a cluster started with start")
+    stop_parser.add_argument("--scheduler-address", type=str, default="tcp://localhost:8786", help="Scheduler address")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = persistent_dask_cluster_args_parser()
+    if args.command == "start":
+        start_dask_cluster()
+    else:
+        stop_dask_cluster(args.scheduler_address)
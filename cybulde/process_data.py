@@ -1,27 +1,66 @@
 # from cybulde.config_schemas.config_schema import Config
+import argparse
 import os
 
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Any, Optional
 
 # import dask
 import dask.dataframe as dd
+import pandas as pd
+import yaml
 
 from hydra.utils import instantiate
 
 from cybulde.config_schemas.data_processing.dataset_cleaner_schema import DatasetCleanerManagerConfig
 from cybulde.config_schemas.data_processing_config_schema import DataProcessingConfig
-from cybulde.utils.config_utils import custom_instantiate, get_pickle_config
-from cybulde.utils.data_utils import filter_based_on_minimum_number_of_words  # ,get_raw_data_with_version,
+from cybulde.utils.config_utils import get_pickle_config
+from cybulde.utils.dask_utils import get_dask_client, get_nrof_workers, save_dask_diagnostics
+from cybulde.utils.data_utils import (  # ,get_raw_data_with_version,
+    add_text_statistics_columns,
+    filter_based_on_minimum_number_of_words,
+)
 from cybulde.utils.io_utils import write_yaml_file
+from cybulde.utils.memory_utils import memory_stage, partition_memory, save_memory_report
+from cybulde.utils.profiling_utils import profile_partition, save_partition_profile
+from cybulde.utils.tracing_utils import span, trace_to_file
 
 # from cybulde.utils.gcp_utils import access_secret_version
 from cybulde.utils.utils import get_logger
 
+TRACE_FILE_NAME = "process_data_trace.json"
+TRACE_SUMMARY_FILE_NAME = "process_data_trace_summary.yaml"
+MEMORY_REPORT_FILE_NAME = "memory_report.yaml"
+PARTITION_PROFILE_FILE_NAME = "process_data_partition_profile.collapsed"
+PLAN_FILE_NAME = "process_data_plan.yaml"
+
 
 def process_raw_data(
-    df_partition: dd.core.DataFrame, dataset_cleaner_manager: DatasetCleanerManagerConfig
+    df_partition: dd.core.DataFrame,
+    dataset_cleaner_manager: DatasetCleanerManagerConfig,
+    partition_info: Optional[dict[str, Any]] = None,
 ) -> dd.core.Series:
-    return df_partition["text"].apply(dataset_cleaner_manager) # type: ignore
+    with span("clean_partition", nrof_rows=len(df_partition)), partition_memory(df_partition):
+        with profile_partition(partition_info):
+            return df_partition["text"].apply(dataset_cleaner_manager)  # type: ignore
+
+
+def clean_data(df: dd.core.DataFrame, dataset_cleaner_manager: DatasetCleanerManagerConfig) -> dd.core.DataFrame:
+    df = df.assign(
+        cleaned_text=df.map_partitions(  # type: ignore[no-untyped-call]
+            process_raw_data, dataset_cleaner_manager=dataset_cleaner_manager, meta=("text", "object")
+        )
+    )
+    df = df.map_partitions(add_text_statistics_columns, text_column_name="cleaned_text")  # type: ignore[no-untyped-call]
+    return df
+
+
+def filter_splits(df: pd.DataFrame, min_nrof_words: int) -> dict[str, pd.DataFrame]:
+    return {
+        split_name: filter_based_on_minimum_number_of_words(df[df["split"] == split_name], min_nrof_words)
+        for split_name in ["train", "dev", "test"]
+    }
 
 
 # original decorator removed @get_config(config_path="../configs", config_name="data_processing_config")
@@ -36,71 +75,115 @@ def process_data(config: DataProcessingConfig) -> None:
     logger.info("Processing raw data...")
     processed_data_save_dir = config.processed_data_save_dir
 
-    if config.dask_cluster._target_ == "dask.distributed.LocalCluster":
-        logger.info("Local Processing using Dask LocalCluster...")
-        from dask.distributed import LocalCluster
-
-        cluster = LocalCluster(config.dask_cluster) # type: ignore
-        client = cluster.get_client() # type: ignore
-    else:
-        logger.info("Remote Processing on GCP...")
-        from dask.distributed import Client
-
-        cluster = custom_instantiate(config.dask_cluster)
-        client = Client(cluster) # type: ignore
-    try:
-        dataset_reader_manager = instantiate(config.dataset_reader_manager)
-        dataset_cleaner_manager = instantiate(config.dataset_cleaner_manager)
-
-        df = dataset_reader_manager.read_data(config.dask_cluster.n_workers)
-
-        logger.info("Cleaning data ...")
-        df = df.assign(
-            cleaned_text=df.map_partitions(
-                process_raw_data, dataset_cleaner_manager=dataset_cleaner_manager, meta=("text", "object")
+    # A cluster created for this run is closed at the end, an existing one the client attaches to is kept running
+    with get_dask_client(config.dask_cluster) as client:
+        # The performance report, task stream and worker profile outlive the cluster
+        diagnostics = (
+            save_dask_diagnostics(client, processed_data_save_dir) if config.save_dask_diagnostics else nullcontext()
+        )
+        tracing = (
+            trace_to_file(
+                os.path.join(processed_data_save_dir, TRACE_FILE_NAME),
+                os.path.join(processed_data_save_dir, TRACE_SUMMARY_FILE_NAME),
+                client,
             )
+            if config.save_trace
+            else nullcontext()
         )
-        logger.info("started computing data ...")
-        df = df.compute()
-        # dask.compute(df)
-        logger.info("Finished computing data ...")
-
-        train_parquet_path = os.path.join(processed_data_save_dir, "train.parquet")
-        dev_parquet_path = os.path.join(processed_data_save_dir, "dev.parquet")
-        test_parquet_path = os.path.join(processed_data_save_dir, "test.parquet")
-
-        logger.info(f"min_nrof_words: {config.min_nrof_words} ..")
-        logger.info(f"train_parquet_path: {train_parquet_path}")
-        logger.info(f"dev_parquet_path: {dev_parquet_path}")
-        logger.info(f"test_parquet_path: {test_parquet_path}")
-        logger.info("Filtering rows ...")
-
-        train_df = df[df["split"] == "train"]
-        dev_df = df[df["split"] == "dev"]
-        test_df = df[df["split"] == "test"]
-
-        train_df = filter_based_on_minimum_number_of_words(train_df, min_nrof_words=config.min_nrof_words)
-        dev_df = filter_based_on_minimum_number_of_words(dev_df, min_nrof_words=config.min_nrof_words)
-        test_df = filter_based_on_minimum_number_of_words(test_df, min_nrof_words=config.min_nrof_words)
-
-        logger.info("Filtering finished ...")
-
-        train_df.to_parquet(train_parquet_path)
-        dev_df.to_parquet(dev_parquet_path)
-        test_df.to_parquet(test_parquet_path)
-
-        logger.info("docker image push starting...")
-        docker_info = {"docker_image": config.docker_image_name, "docker_tag": config.docker_image_tag}
-        docker_info_save_path = os.path.join(processed_data_save_dir, "docker_info.yaml")
-        write_yaml_file(docker_info_save_path, docker_info)
+        memory_monitoring = (
+            save_memory_report(
+                os.path.join(processed_data_save_dir, MEMORY_REPORT_FILE_NAME),
+                config.memory_sampling_interval_seconds,
+                client,
+            )
+            if config.save_memory_report
+            else nullcontext()
+        )
+        partition_profiling = (
+            save_partition_profile(
+                os.path.join(processed_data_save_dir, PARTITION_PROFILE_FILE_NAME),
+                config.profile_partition_fraction,
+                config.profiling_interval_seconds,
+                client,
+            )
+            if config.profile_partition_fraction is not None
+            else nullcontext()
+        )
+        with diagnostics, tracing, memory_monitoring, partition_profiling:
+            dataset_reader_manager = instantiate(config.dataset_reader_manager)
+            dataset_cleaner_manager = instantiate(config.dataset_cleaner_manager)
+            dataset_writer = instantiate(config.dataset_writer, _convert_="all")
+
+            # Builds the task graph, the readers compute the split names and the partition sizes eagerly
+            with span("read"), memory_stage("read", client):
+                df = dataset_reader_manager.read_data(get_nrof_workers(config.dask_cluster))
+
+            logger.info("Cleaning data and computing text statistics ...")
+            df = clean_data(df, dataset_cleaner_manager)
+
+            logger.info("started computing data ...")
+            with span("clean", nrof_partitions=df.npartitions), memory_stage("clean", client):
+                df = df.compute()  # type: ignore[no-untyped-call]
+            # dask.compute(df)
+            logger.info("Finished computing data ...")
+
+            logger.info(f"min_nrof_words: {config.min_nrof_words} ..")
+            logger.info("Filtering rows ...")
+            with span("filter", nrof_rows=len(df)), memory_stage("filter", client):
+                split_dfs = filter_splits(df, config.min_nrof_words)
+            logger.info("Filtering finished ...")
+
+            logger.info("Writing splits and docker info ...")
+            docker_info = {"docker_image": config.docker_image_name, "docker_tag": config.docker_image_tag}
+            nrof_rows = sum(len(split_df) for split_df in split_dfs.values())
+            with span("write", nrof_rows=nrof_rows), memory_stage("write", client):
+                dataset_writer.write_splits(
+                    split_dfs, processed_data_save_dir, yaml_files={"docker_info.yaml": docker_info}
+                )
+
+            logger.info("docker image push finished...")
+            logger.info("data processing finished!")
+
+
+@get_pickle_config(config_path="cybulde/configs/automatically_generated", config_name="data_processing_config")  # type: ignore
+def plan_process_data(config: DataProcessingConfig) -> None:
+    """
+    Estimate the size, partitions, memory and wall time of process_data from a sample of the raw data, without a cluster
+    """
+    # Only needed to plan, so the dask workers importing this module don't import it
+    from cybulde.data_processing.process_data_planner import get_process_data_plan
 
-        logger.info("docker image push finished...")
-        logger.info("data processing finished!")
-    finally:
-        logger.info("closing dask client and cluster...")
-        client.close()
-        cluster.close()
+    logger = get_logger(Path(__file__).name)
+    logger.info(f"Planning process_data from {config.plan_nrof_sample_rows} rows of every raw file...")
+    dataset_reader_manager = instantiate(config.dataset_reader_manager)
+    dataset_cleaner_manager = instantiate(config.dataset_cleaner_manager)
+    dataset_writer = instantiate(config.dataset_writer, _convert_="all")
+    plan = get_process_data_plan(
+        dataset_reader_manager,
+        dataset_cleaner_manager,
+        dataset_writer,
+        config.dask_cluster,
+        config.min_nrof_words,
+        config.plan_nrof_sample_rows,
+    )
+
+    plan_file_path = os.path.join(config.processed_data_save_dir, PLAN_FILE_NAME)
+    write_yaml_file(plan_file_path, plan)
+    logger.info(f"Wrote {plan_file_path}:\n{yaml.dump(plan)}")
+    for warning in plan["warnings"]:
+        logger.warning(warning)
+
+
+def process_data_args_parser() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--plan", action="store_true", help="Only estimate the size, memory and time of the run, without a cluster"
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    process_data()
+    if process_data_args_parser().plan:
+        plan_process_data()
+    else:
+        process_data()
@@ -0,0 +1,154 @@
+import multiprocessing
+import os
+import resource
+import time
+
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import pyarrow as pa
+
+from hydra.utils import instantiate
+
+from cybulde.config_schemas.tokenization.tokenizer_schema import TokenizerConfig
+from cybulde.config_schemas.tokenizer_sweep_config_schema import TokenizerSweepConfig
+from cybulde.utils.arrow_utils import load_arrow_ipc
+from cybulde.utils.config_utils import get_pickle_config
+from cybulde.utils.data_utils import get_parquet_dataset, reservoir_sample_texts
+from cybulde.utils.io_utils import make_dirs, write_yaml_file
+from cybulde.utils.utils import get_logger
+
+CORPUS_SCHEMA = pa.schema([("text", pa.large_string())])
+
+
+def write_texts_as_arrow_ipc(texts: list[str], path: str) -> None:
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, CORPUS_SCHEMA) as writer:
+        writer.write_table(pa.table([pa.array(texts, type=pa.large_string())], schema=CORPUS_SCHEMA))
+
+
+def write_sweep_corpus(config: TokenizerSweepConfig, corpus_path: str, holdout_path: str) -> bool:
+    """
+    Read the training texts once into a local Arrow IPC file, which every worker memory-maps.
+    Without sampling the texts are streamed, so the corpus doesn't need to fit into memory.
+    Returns whether a holdout file was written.
+    """
+    dataset = get_parquet_dataset(config.data_parquet_path)
+    sampling = config.sampling
+    if sampling.nrof_samples is not None or sampling.sample_fraction is not None:
+        sampled_texts, holdout_texts = reservoir_sample_texts(
+            dataset,
+            config.text_column_name,
+            nrof_samples=sampling.nrof_samples,
+            sample_fraction=sampling.sample_fraction,
+            nrof_holdout_samples=sampling.nrof_holdout_samples,
+            seed=sampling.seed,
+            batch_size=config.batch_size,
+            stratify_column_name=sampling.stratify_column_name,
+        )
+        write_texts_as_arrow_ipc(sampled_texts, corpus_path)
+        write_texts_as_arrow_ipc(holdout_texts, holdout_path)
+        return True
+
+    with pa.OSFile(corpus_path, "wb") as sink, pa.ipc.new_file(sink, CORPUS_SCHEMA) as writer:
+        for record_batch in dataset.to_batches(columns=[config.text_column_name], batch_size=config.batch_size):
+            texts = record_batch.column(0).cast(pa.large_string())
+            writer.write_batch(pa.record_batch([texts], schema=CORPUS_SCHEMA))
+    return False
+
+
+def iter_corpus_batches(texts: pa.ChunkedArray, batch_size: int) -> Iterator[list[str]]:
+    for start_idx in range(0, len(texts), batch_size):
+        text_batch: list[str] = texts.slice(start_idx, batch_size).to_pylist()
+        yield text_batch
+
+
+def set_rayon_num_threads(rayon_num_threads: int) -> None:
+    # Read by the tokenizers library when its thread pool is first used, so it has to be set before training
+    os.environ["RAYON_NUM_THREADS"] = str(rayon_num_threads)
+
+
+def train_sweep_tokenizer(
+    tokenizer_name: str,
+    tokenizer_config: TokenizerConfig,
+    corpus_path: str,
+    holdout_path: Optional[str],
+    tokenizer_save_dir: str,
+    batch_size: int,
+) -> dict[str, Any]:
+    logger = get_logger(tokenizer_name)
+    tokenizer = instantiate(tokenizer_config, _convert_="all")
+    texts = load_arrow_ipc(corpus_path).column("text")
+
+    logger.info(f"Training on {len(texts)} texts...")
+    start_time = time.perf_counter()
+    tokenizer.train(iter_corpus_batches(texts, batch_size), length=len(texts))
+    training_seconds = time.perf_counter() - start_time
+
+    tokenizer.save(tokenizer_save_dir)
+
+    # Every task runs in a fresh process (maxtasksperchild=1), so the peak RSS is the one of this tokenizer.
+    # It includes the touched pages of the memory-mapped corpus, which are shared between the workers.
+    stats = {
+        "training_seconds": round(training_seconds, 3),
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "rayon_num_threads": int(os.environ.get("RAYON_NUM_THREADS", 0)),
+        "nrof_texts": len(texts),
+        "vocab_size": tokenizer.tokenizer.get_vocab_size(),
+    }
+    if holdout_path is not None:
+        holdout_texts = load_arrow_ipc(holdout_path).column("text").to_pylist()
+        stats["holdout"] = tokenizer.get_coverage_stats(holdout_texts, batch_size)
+    write_yaml_file(os.path.join(tokenizer_save_dir, "tokenizer_sweep_stats.yaml"), stats)
+    logger.info(f"Done: {stats}")
+    return stats
+
+
+@get_pickle_config(config_path="cybulde/configs/automatically_generated", config_name="tokenizer_sweep_config")  # type: ignore
+def sweep_tokenizers(config: TokenizerSweepConfig) -> None:
+    logger = get_logger(Path(__file__).name)
+    sweep_save_dir = os.path.join(os.path.dirname(config.data_parquet_path), "tokenizer_sweep")
+
+    make_dirs(config.corpus_cache_dir)
+    corpus_path = os.path.join(config.corpus_cache_dir, "corpus.arrow")
+    holdout_path = os.path.join(config.corpus_cache_dir, "holdout.arrow")
+    logger.info(f"Reading the corpus once into {corpus_path}...")
+    has_holdout = write_sweep_corpus(config, corpus_path, holdout_path)
+
+    # The cores are split between the workers, and each worker's tokenizers thread pool gets its share
+    nrof_cores = len(os.sched_getaffinity(0))
+    nrof_workers = min(config.nrof_workers or nrof_cores, len(config.tokenizers))
+    rayon_num_threads = max(1, nrof_cores // nrof_workers)
+    logger.info(
+        f"Training {len(config.tokenizers)} tokenizers with {nrof_workers} workers, {rayon_num_threads} threads each"
+    )
+
+    # spawn, as the tokenizers thread pool doesn't survive a fork
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(
+        nrof_workers, initializer=set_rayon_num_threads, initargs=(rayon_num_threads,), maxtasksperchild=1
+    ) as pool:
+        results = {
+            tokenizer_name: pool.apply_async(
+                train_sweep_tokenizer,
+                (
+                    tokenizer_name,
+                    tokenizer_config,
+                    corpus_path,
+                    holdout_path if has_holdout else None,
+                    os.path.join(sweep_save_dir, tokenizer_name),
+                    config.batch_size,
+                ),
+            )
+            for tokenizer_name, tokenizer_config in config.tokenizers.items()
+        }
+        sweep_stats = {tokenizer_name: result.get() for tokenizer_name, result in results.items()}
+
+    write_yaml_file(os.path.join(sweep_save_dir, "sweep_stats.yaml"), sweep_stats)
+    docker_info = {"docker_image": config.docker_image_name, "docker_tag": config.docker_image_tag}
+    write_yaml_file(os.path.join(sweep_save_dir, "tokenizer_sweep_docker_info.yaml"), docker_info)
+
+    logger.info("Tokenizer sweep done...")
+
+
+if __name__ == "__main__":
+    sweep_tokenizers()
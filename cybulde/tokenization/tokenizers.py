@@ -1,8 +1,12 @@
 import os
 
 from abc import ABC, abstractmethod
+from collections import Counter
+from itertools import repeat
 from tempfile import TemporaryDirectory
-from typing import Optional, Union
+from typing import Any, Iterable, Iterator, Mapping, Optional, Union
+
+import numpy as np
 
 from tokenizers import Tokenizer
 from tokenizers.decoders import Decoder
@@ -11,7 +15,6 @@
 from tokenizers.pre_tokenizers import PreTokenizer
 from tokenizers.processors import BertProcessing, ByteLevel, RobertaProcessing, TemplateProcessing
 from tokenizers.trainers import BpeTrainer, UnigramTrainer, WordLevelTrainer, WordPieceTrainer
-from transformers import PreTrainedTokenizerFast
 
 from cybulde.utils.io_utils import copy_dir
 
@@ -21,7 +24,10 @@
 
 class BaseTokenizer(ABC):
     @abstractmethod
-    def train(self, texts: list[str]) -> None:
+    def train(self, texts: Iterable[Union[str, list[str]]], length: Optional[int] = None) -> None:
+        """
+        texts can be single texts or batches of texts, length is the total number of texts
+        """
         pass
 
     @abstractmethod
@@ -61,12 +67,97 @@ def __init__(
         if post_processor is not None:
             self.tokenizer.post_processor = post_processor
 
-    def train(self, texts: list[str]) -> None:
-        self.tokenizer.train_from_iterator(texts, trainer=self.trainer)
+    def train(self, texts: Iterable[Union[str, list[str]]], length: Optional[int] = None) -> None:
+        self.tokenizer.train_from_iterator(texts, trainer=self.trainer, length=length)
+        self.enable_padding()
+
+    def get_word_frequencies(self, texts: Iterable[str]) -> Counter[str]:
+        """
+        Count the words the trainer sees, i.e. the pre-tokenized splits of the normalized texts
+        """
+        normalizer = self.tokenizer.normalizer
+        pre_tokenizer = self.tokenizer.pre_tokenizer
+        word_frequencies: Counter[str] = Counter()
+        for text in texts:
+            if normalizer is not None:
+                text = normalizer.normalize_str(text)
+            word_frequencies.update(word for word, _ in pre_tokenizer.pre_tokenize_str(text))
+        return word_frequencies
+
+    def train_from_word_frequencies(
+        self, word_frequencies: Mapping[str, int], batch_size: int = 10_000, max_nrof_words: Optional[int] = None
+    ) -> None:
+        """
+        Train from the output of get_word_frequencies. The bindings only take sequences, not (word, count) pairs,
+        so every counted word occurrence is fed to the trainer. With max_nrof_words the counts are first scaled
+        down to max_nrof_words words in total, so feeding them is O(word types + max_nrof_words) instead of
+        O(total words), like training on a sample of the texts. min_frequency then applies to the scaled counts.
+        Without it, this gives the same tokenizer as training on the texts.
+        """
+        if max_nrof_words is not None and sum(word_frequencies.values()) > max_nrof_words:
+            word_frequencies = scale_word_frequencies(word_frequencies, max_nrof_words)
+
+        normalizer = self.tokenizer.normalizer
+        pre_tokenizer = self.tokenizer.pre_tokenizer
+        # The words are already normalized and pre-tokenized, so every word is fed as a sequence on its own
+        self.tokenizer.normalizer = None
+        self.tokenizer.pre_tokenizer = None
+        try:
+            self.tokenizer.train_from_iterator(
+                iter_word_batches(word_frequencies, batch_size),
+                trainer=self.trainer,
+                length=sum(word_frequencies.values()),
+            )
+        finally:
+            self.tokenizer.normalizer = normalizer
+            self.tokenizer.pre_tokenizer = pre_tokenizer
+        self.enable_padding()
+
+    def get_coverage_stats(self, texts: list[str], batch_size: int = 10_000) -> dict[str, Any]:
+        """
+        unk_rate: share of the tokens that are the unknown token
+        word_coverage: share of the pre-tokenized words that are a single token in the vocabulary
+        fertility: average number of tokens per pre-tokenized word
+        """
+        vocab = self.tokenizer.get_vocab()
+        unk_id = None if self.unk_token is None else self.tokenizer.token_to_id(self.unk_token)
+
+        word_frequencies = self.get_word_frequencies(texts)
+        nrof_words = sum(word_frequencies.values())
+        nrof_covered_words = sum(count for word, count in word_frequencies.items() if word in vocab)
+        nrof_covered_word_types = sum(1 for word in word_frequencies if word in vocab)
+
+        nrof_tokens = 0
+        nrof_unk_tokens = 0
+        for start_idx in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start_idx : start_idx + batch_size], add_special_tokens=False)
+            for encoding in encodings:
+                # Only padding is masked out, as no special tokens are added
+                token_ids = [token_id for token_id, mask in zip(encoding.ids, encoding.attention_mask) if mask]
+                nrof_tokens += len(token_ids)
+                # Without an unknown token in the vocabulary there are no unknown tokens to count
+                if unk_id is not None:
+                    nrof_unk_tokens += token_ids.count(unk_id)
+
+        return {
+            "nrof_texts": len(texts),
+            "nrof_words": nrof_words,
+            "nrof_word_types": len(word_frequencies),
+            "nrof_tokens": nrof_tokens,
+            "unk_rate": nrof_unk_tokens / max(nrof_tokens, 1),
+            "word_coverage": nrof_covered_words / max(nrof_words, 1),
+            "word_type_coverage": nrof_covered_word_types / max(len(word_frequencies), 1),
+            "fertility": nrof_tokens / max(nrof_words, 1),
+        }
+
+    def enable_padding(self) -> None:
         if self.pad_token is not None:
             self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(self.pad_token), pad_token=self.pad_token)
 
     def save(self, tokenizer_save_dir: str) -> None:
+        # transformers takes longer to import than the rest of the tokenizer training, so it is only imported to save
+        from transformers import PreTrainedTokenizerFast
+
         tokenizer = PreTrainedTokenizerFast(
             tokenizer_object=self.tokenizer,
             unk_token=self.unk_token,
@@ -79,3 +170,50 @@ def save(self, tokenizer_save_dir: str) -> None:
             temp_tokenizer_save_dir = os.path.join(tmp_dir_name, "trained_tokenizer")
             tokenizer.save_pretrained(temp_tokenizer_save_dir)
             copy_dir(temp_tokenizer_save_dir, tokenizer_save_dir)
+
+
+def get_word_piece_trainer(
+    limit_alphabet: Optional[int] = None, end_of_word_suffix: Optional[str] = None, **kwargs: Any
+) -> WordPieceTrainer:
+    """
+    WordPieceTrainer with limit_alphabet and end_of_word_suffix only passed when they are set,
+    as it doesn't take None for them
+    """
+    if limit_alphabet is not None:
+        kwargs["limit_alphabet"] = limit_alphabet
+    if end_of_word_suffix is not None:
+        kwargs["end_of_word_suffix"] = end_of_word_suffix
+    return WordPieceTrainer(**kwargs)
+
+
+def scale_word_frequencies(word_frequencies: Mapping[str, int], nrof_words: int) -> dict[str, int]:
+    """
+    Scale the counts to nrof_words words in total, in proportion to their counts: every scaled count is rounded
+    down, and the words with the largest remainders (in word order on ties) get one more. Words whose count
+    rounds to 0 are dropped, as rare words are from a sample of the texts.
+    """
+    words = sorted(word_frequencies)
+    counts = np.array([word_frequencies[word] for word in words], dtype=np.float64)
+    scaled_counts = counts * (nrof_words / counts.sum())
+    rounded_counts = np.floor(scaled_counts).astype(np.int64)
+    nrof_missing_words = nrof_words - int(rounded_counts.sum())
+    rounded_counts[np.argsort(rounded_counts - scaled_counts, kind="stable")[:nrof_missing_words]] += 1
+    return {word: int(count) for word, count in zip(words, rounded_counts) if count > 0}
+
+
+def iter_word_batches(word_frequencies: Mapping[str, int], batch_size: int) -> Iterator[list[str]]:
+    """
+    Repeat every word as many times as it occurs, in batches of batch_size words,
+    so this yields as many words as the texts the frequencies were counted from
+    """
+    batch: list[str] = []
+    for word, count in word_frequencies.items():
+        while count > 0:
+            nrof_repeats = min(count, batch_size - len(batch))
+            batch.extend(repeat(word, nrof_repeats))
+            count -= nrof_repeats
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
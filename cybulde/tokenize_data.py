@@ -0,0 +1,146 @@
+import os
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any
+
+import numpy as np
+import pyarrow.dataset as ds
+
+from fsspec.utils import get_protocol
+from tokenizers import Tokenizer
+
+from cybulde.config_schemas.tokenize_data_config_schema import TokenizeDataConfig
+from cybulde.utils.config_utils import get_pickle_config
+from cybulde.utils.data_utils import get_parquet_dataset
+from cybulde.utils.io_utils import (
+    LOCAL_FILE_SYSTEM_NAME,
+    choose_file_system,
+    is_file,
+    make_dirs,
+    open_file,
+    write_yaml_file,
+)
+from cybulde.utils.tokenized_data_utils import (
+    LABELS_FILE_SUFFIX,
+    METADATA_FILE_NAME,
+    OFFSETS_FILE_SUFFIX,
+    TOKEN_IDS_FILE_SUFFIX,
+    get_token_id_dtype,
+    write_npy_from_raw_file,
+)
+from cybulde.utils.utils import get_logger
+
+
+def get_split_path(processed_data_dir: str, split_name: str) -> str:
+    split_file_path = os.path.join(processed_data_dir, f"{split_name}.parquet")
+    return split_file_path if is_file(split_file_path) else os.path.join(processed_data_dir, split_name)
+
+
+def tokenize_split(
+    config: TokenizeDataConfig,
+    tokenizer: Tokenizer,
+    dataset: ds.Dataset,
+    token_id_dtype: Any,
+    split_name: str,
+    output_dir: str,
+) -> dict[str, Any]:
+    """
+    Write the token ids of all texts after each other into <split>_token_ids.npy, the start of every
+    sequence (and the end of the last one) into <split>_offsets.npy, and the labels into <split>_labels.npy
+    """
+    raw_token_ids_path = os.path.join(output_dir, f"{split_name}_token_ids.raw")
+    sequence_lengths = []
+    labels = []
+    with open(raw_token_ids_path, "wb") as raw_token_ids_file:
+        for record_batch in dataset.to_batches(
+            columns=[config.text_column_name, config.label_column_name], batch_size=config.batch_size
+        ):
+            encodings = tokenizer.encode_batch(
+                record_batch.column(config.text_column_name).to_pylist(), add_special_tokens=config.add_special_tokens
+            )
+            token_ids = [np.asarray(encoding.ids, dtype=token_id_dtype) for encoding in encodings]
+            if token_ids:
+                raw_token_ids_file.write(np.concatenate(token_ids).tobytes())
+            sequence_lengths.append(np.fromiter(map(len, token_ids), dtype=np.int64, count=len(token_ids)))
+            labels.append(record_batch.column(config.label_column_name).to_numpy())
+
+    lengths = np.concatenate(sequence_lengths) if sequence_lengths else np.empty(0, dtype=np.int64)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    write_npy_from_raw_file(
+        raw_token_ids_path, os.path.join(output_dir, f"{split_name}{TOKEN_IDS_FILE_SUFFIX}"), token_id_dtype
+    )
+    os.remove(raw_token_ids_path)
+    np.save(os.path.join(output_dir, f"{split_name}{OFFSETS_FILE_SUFFIX}"), offsets)
+    np.save(
+        os.path.join(output_dir, f"{split_name}{LABELS_FILE_SUFFIX}"),
+        np.concatenate(labels) if labels else np.empty(0, dtype=np.int64),
+    )
+
+    return {
+        "nrof_sequences": len(lengths),
+        "nrof_tokens": int(offsets[-1]),
+        "max_sequence_length": int(lengths.max()) if len(lengths) else 0,
+        "mean_sequence_length": float(lengths.mean()) if len(lengths) else 0.0,
+    }
+
+
+def tokenize_splits(config: TokenizeDataConfig, output_dir: str) -> dict[str, Any]:
+    logger = get_logger(Path(__file__).name)
+    with open_file(os.path.join(config.tokenizer_dir, "tokenizer.json"), "r") as tokenizer_file:
+        tokenizer = Tokenizer.from_str(tokenizer_file.read())
+    # Sequences are stored with their own lengths, padding and truncation are left to the training code
+    tokenizer.no_padding()
+    tokenizer.no_truncation()
+
+    vocab_size = tokenizer.get_vocab_size(with_added_tokens=True)
+    token_id_dtype = get_token_id_dtype(vocab_size)
+
+    split_stats = {}
+    for split_name in config.split_names:
+        split_path = get_split_path(config.processed_data_dir, split_name)
+        logger.info(f"Tokenizing {split_path}...")
+        split_stats[split_name] = tokenize_split(
+            config, tokenizer, get_parquet_dataset(split_path), token_id_dtype, split_name, output_dir
+        )
+        logger.info(f"{split_name}: {split_stats[split_name]}")
+
+    return {
+        "tokenizer_dir": config.tokenizer_dir,
+        "vocab_size": vocab_size,
+        "token_id_dtype": np.dtype(token_id_dtype).name,
+        "add_special_tokens": config.add_special_tokens,
+        "splits": split_stats,
+    }
+
+
+@get_pickle_config(config_path="cybulde/configs/automatically_generated", config_name="tokenize_data_config")  # type: ignore
+def tokenize_data(config: TokenizeDataConfig) -> None:
+    logger = get_logger(Path(__file__).name)
+    save_dir = config.tokenized_data_save_dir
+
+    if get_protocol(save_dir) == LOCAL_FILE_SYSTEM_NAME:
+        make_dirs(save_dir)
+        metadata = tokenize_splits(config, save_dir)
+    else:
+        # The arrays are built in local files and then uploaded
+        with TemporaryDirectory() as output_dir:
+            metadata = tokenize_splits(config, output_dir)
+            file_system = choose_file_system(save_dir)
+            for split_name in config.split_names:
+                for file_suffix in [TOKEN_IDS_FILE_SUFFIX, OFFSETS_FILE_SUFFIX, LABELS_FILE_SUFFIX]:
+                    file_name = f"{split_name}{file_suffix}"
+                    logger.info(f"Uploading {file_name}...")
+                    file_system.put(os.path.join(output_dir, file_name), os.path.join(save_dir, file_name))
+
+    write_yaml_file(os.path.join(save_dir, METADATA_FILE_NAME), metadata)
+    docker_info = {"docker_image": config.docker_image_name, "docker_tag": config.docker_image_tag}
+    write_yaml_file(os.path.join(save_dir, "tokenize_data_docker_info.yaml"), docker_info)
+
+    logger.info("Tokenizing data done...")
+
+
+if __name__ == "__main__":
+    tokenize_data()
@@ -1,42 +1,204 @@
+import hashlib
+import json
 import os
+import time
 
+from contextlib import nullcontext
+from dataclasses import asdict
 from pathlib import Path
+from typing import Any, Optional
 
 import pandas as pd
+import yaml
 
 from hydra.utils import instantiate
 
 from cybulde.config_schemas.tokenizer_training_config_schema import TokenizerTrainingConfig
+from cybulde.tokenization.tokenizers import HuggingFaceTokenizer
 from cybulde.utils.config_utils import get_pickle_config
-from cybulde.utils.io_utils import write_yaml_file
+from cybulde.utils.dask_utils import get_dask_client
+from cybulde.utils.data_utils import (
+    get_parquet_dataset,
+    get_parquet_file_paths,
+    get_parquet_files_fingerprint,
+    iter_text_batches,
+    reservoir_sample_texts,
+)
+from cybulde.utils.io_utils import is_file, open_file, write_yaml_file
+from cybulde.utils.tracing_utils import span, trace_to_file
 from cybulde.utils.utils import get_logger
 
+TOKENIZER_FINGERPRINT_FILE_NAME = "tokenizer_fingerprint.yaml"
+TRACE_FILE_NAME = "tokenizer_training_trace.json"
+TRACE_SUMMARY_FILE_NAME = "tokenizer_training_trace_summary.yaml"
+
+
+def get_partition_word_frequencies(texts: pd.Series, tokenizer: HuggingFaceTokenizer) -> pd.DataFrame:
+    word_frequencies = tokenizer.get_word_frequencies(texts)
+    return pd.DataFrame({"word": list(word_frequencies.keys()), "count": list(word_frequencies.values())})
+
+
+def compute_word_frequencies(
+    config: TokenizerTrainingConfig, tokenizer: HuggingFaceTokenizer, data_parquet_path: str, text_column_name: str
+) -> dict[str, int]:
+    """
+    Map: count the pre-tokenized words of every parquet partition, reduce: sum the counts per word
+    """
+    import dask.dataframe as dd
+
+    df = dd.read_parquet(get_parquet_file_paths(data_parquet_path), columns=[text_column_name])
+    partition_word_frequencies = df[text_column_name].map_partitions(
+        get_partition_word_frequencies,
+        tokenizer=tokenizer,
+        meta=pd.DataFrame({"word": pd.Series(dtype="object"), "count": pd.Series(dtype="int64")}),
+    )
+    word_frequencies = partition_word_frequencies.groupby("word")["count"].sum()
+
+    if config.dask_cluster is None:
+        word_frequencies = word_frequencies.compute(scheduler="processes")
+    else:
+        with get_dask_client(config.dask_cluster):
+            word_frequencies = word_frequencies.compute()
+
+    word_frequencies_dict: dict[str, int] = word_frequencies.to_dict()
+    return word_frequencies_dict
+
+
+def get_tokenizer_fingerprint(config: TokenizerTrainingConfig) -> dict[str, Any]:
+    """
+    Hash of everything the trained tokenizer depends on: the resolved tokenizer config,
+    which texts it is trained on and the identity of the parquet files they are read from
+    """
+    fingerprint_inputs = {
+        "tokenizer": asdict(config.tokenizer),
+        "text_column_name": config.text_column_name,
+        "sampling": asdict(config.sampling),
+        # Scaling the word frequencies down changes what the tokenizer is trained on
+        "word_frequencies_max_nrof_words": (
+            config.word_frequencies_max_nrof_words if config.train_from_word_frequencies else None
+        ),
+        "data_files": get_parquet_files_fingerprint(config.data_parquet_path),
+    }
+    fingerprint_json = json.dumps(fingerprint_inputs, sort_keys=True, default=str)
+    return {"fingerprint": hashlib.sha256(fingerprint_json.encode("utf-8")).hexdigest(), **fingerprint_inputs}
+
+
+def read_cached_tokenizer_fingerprint(tokenizer_save_dir: str) -> Optional[str]:
+    fingerprint_path = os.path.join(tokenizer_save_dir, TOKENIZER_FINGERPRINT_FILE_NAME)
+    if not is_file(fingerprint_path) or not is_file(os.path.join(tokenizer_save_dir, "tokenizer.json")):
+        return None
+    with open_file(fingerprint_path, "r") as f:
+        cached_fingerprint: Optional[str] = yaml.safe_load(f).get("fingerprint")
+    return cached_fingerprint
+
 
 @get_pickle_config(config_path="cybulde/configs/automatically_generated", config_name="tokenizer_training_config") # type: ignore
 def train_tokenizer(config: TokenizerTrainingConfig) -> None:
     logger = get_logger((Path(__file__).name))
     data_parquet_path = config.data_parquet_path
     text_column_name = config.text_column_name
+    tokenizer_save_dir = os.path.join(os.path.dirname(data_parquet_path), "trained_tokenizer")
 
-    tokenizer = instantiate(config.tokenizer, _convert_="all")  # ,
+    tracing = (
+        trace_to_file(
+            os.path.join(tokenizer_save_dir, TRACE_FILE_NAME), os.path.join(tokenizer_save_dir, TRACE_SUMMARY_FILE_NAME)
+        )
+        if config.save_trace
+        else nullcontext()
+    )
+    with tracing:
+        with span("fingerprint"):
+            tokenizer_fingerprint = get_tokenizer_fingerprint(config)
+        if config.reuse_cached_tokenizer:
+            cached_fingerprint = read_cached_tokenizer_fingerprint(tokenizer_save_dir)
+            if cached_fingerprint == tokenizer_fingerprint["fingerprint"]:
+                logger.info(
+                    f"Fingerprint {cached_fingerprint} matches {tokenizer_save_dir}, reusing it without training"
+                )
+                return
+            if cached_fingerprint is None:
+                logger.info(f"No cached tokenizer in {tokenizer_save_dir}, training")
+            else:
+                logger.info(
+                    f"Fingerprint {tokenizer_fingerprint['fingerprint']} doesn't match the cached {cached_fingerprint}, "
+                    "retraining"
+                )
+        else:
+            logger.info("reuse_cached_tokenizer is disabled, training")
 
-    logger.info("Reading dataset.... ")
-    df = pd.read_parquet(data_parquet_path)
+        tokenizer = instantiate(config.tokenizer, _convert_="all")  # ,
 
-    logger.info("Reading dataset done.... ")
+        sampling = config.sampling
+        is_sampling = sampling.nrof_samples is not None or sampling.sample_fraction is not None
+        if is_sampling and config.train_from_word_frequencies:
+            raise ValueError("sampling can't be used together with train_from_word_frequencies")
 
-    logger.info("Starting training.... ")
-    tokenizer.train(df[text_column_name].values)
+        start_time = time.perf_counter()
+        if is_sampling:
+            logger.info("Sampling texts.... ")
+            with span("sample_texts"):
+                sampled_texts, holdout_texts = reservoir_sample_texts(
+                    get_parquet_dataset(data_parquet_path),
+                    text_column_name,
+                    nrof_samples=sampling.nrof_samples,
+                    sample_fraction=sampling.sample_fraction,
+                    nrof_holdout_samples=sampling.nrof_holdout_samples,
+                    seed=sampling.seed,
+                    batch_size=config.batch_size,
+                    stratify_column_name=sampling.stratify_column_name,
+                )
+            logger.info(f"Sampled {len(sampled_texts)} texts and {len(holdout_texts)} holdout texts")
 
-    logger.info("Saving tokenizer...")
-    tokenizer_save_dir = os.path.join(os.path.dirname(data_parquet_path), "trained_tokenizer")
-    tokenizer.save(tokenizer_save_dir)
+            logger.info("Starting training on the sampled texts.... ")
+            with span("train", nrof_texts=len(sampled_texts)):
+                tokenizer.train(sampled_texts, length=len(sampled_texts))
+        elif config.train_from_word_frequencies:
+            logger.info("Computing word frequencies.... ")
+            with span("compute_word_frequencies"):
+                word_frequencies = compute_word_frequencies(config, tokenizer, data_parquet_path, text_column_name)
+            logger.info(f"Found {len(word_frequencies)} unique words in {sum(word_frequencies.values())} words")
+
+            logger.info("Starting training from word frequencies.... ")
+            with span("train", nrof_words=len(word_frequencies)):
+                tokenizer.train_from_word_frequencies(
+                    word_frequencies, config.batch_size, config.word_frequencies_max_nrof_words
+                )
+        else:
+            dataset = get_parquet_dataset(data_parquet_path)
+            nrof_texts = dataset.count_rows()
+            logger.info(
+                f"Streaming {nrof_texts} texts from column {text_column_name} in batches of {config.batch_size}"
+            )
+
+            logger.info("Starting training.... ")
+            # Reading the batches is interleaved with training, so it is part of this span
+            with span("train", nrof_texts=nrof_texts):
+                tokenizer.train(iter_text_batches(dataset, text_column_name, config.batch_size), length=nrof_texts)
+        training_seconds = time.perf_counter() - start_time
+
+        logger.info("Saving tokenizer...")
+        with span("save"):
+            tokenizer.save(tokenizer_save_dir)
+
+        if is_sampling:
+            logger.info("Computing coverage on the holdout texts...")
+            with span("coverage_stats", nrof_texts=len(holdout_texts)):
+                coverage_stats = {
+                    "nrof_sampled_texts": len(sampled_texts),
+                    "sampling_and_training_seconds": round(training_seconds, 3),
+                    "holdout": tokenizer.get_coverage_stats(holdout_texts, config.batch_size),
+                }
+            logger.info(f"Holdout coverage: {coverage_stats['holdout']}")
+            write_yaml_file(os.path.join(tokenizer_save_dir, "tokenizer_coverage_stats.yaml"), coverage_stats)
+
+        docker_info = {"docker_image": config.docker_image_name, "docker_tag": config.docker_image_tag}
+        docker_info_save_path = os.path.join(tokenizer_save_dir, "tokenizer_training_docker_info.yaml")
+        write_yaml_file(docker_info_save_path, docker_info)
 
-    docker_info = {"docker_image": config.docker_image_name, "docker_tag": config.docker_image_tag}
-    docker_info_save_path = os.path.join(tokenizer_save_dir, "tokenizer_training_docker_info.yaml")
-    write_yaml_file(docker_info_save_path, docker_info)
+        # Written last, so that an interrupted run is never taken for a cached tokenizer
+        write_yaml_file(os.path.join(tokenizer_save_dir, TOKENIZER_FINGERPRINT_FILE_NAME), tokenizer_fingerprint)
 
-    logger.info("Tokenizer training done...")
+        logger.info("Tokenizer training done...")
 
 
 if __name__ == "__main__":
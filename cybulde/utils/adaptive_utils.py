@@ -0,0 +1,47 @@
+from pathlib import Path
+from typing import Any, Hashable, Iterable
+
+from distributed.deploy.adaptive import Adaptive
+
+from cybulde.config_schemas.dask_cluster.dask_cluster_schema import AdaptiveScalingConfig
+from cybulde.utils.utils import get_logger
+
+
+class LoggingAdaptive(Adaptive):
+    """
+    Adaptive scaling which logs when workers are requested and released. The scheduler recommends as many workers
+    as can finish the queued tasks in about target_duration, so they follow the backlog of cleaning tasks.
+    """
+
+    # Upstream AdaptiveCore has the scale_up and scale_down argument annotations swapped, these are the real types
+    async def scale_up(self, n: int) -> None:  # type: ignore[override]
+        logger = get_logger(Path(__file__).name)
+        logger.info(f"Scaling up from {len(self.plan)} to {n} workers for the queued tasks")
+        await super().scale_up(n)  # type: ignore[no-untyped-call]
+
+    async def scale_down(self, workers: Iterable[Hashable]) -> None:  # type: ignore[override]
+        workers = list(workers)
+        if workers:
+            logger = get_logger(Path(__file__).name)
+            logger.info(
+                f"Scaling down from {len(self.plan)} to {len(self.plan) - len(workers)} workers, "
+                f"releasing idle workers: {workers}"
+            )
+        await super().scale_down(workers)
+
+
+def adapt_cluster(cluster: Any, adaptive_config: AdaptiveScalingConfig) -> LoggingAdaptive:
+    logger = get_logger(Path(__file__).name)
+    logger.info(
+        f"Scaling adaptively between {adaptive_config.minimum} and {adaptive_config.maximum} workers, "
+        f"target duration: {adaptive_config.target_duration}"
+    )
+    adaptive: LoggingAdaptive = cluster.adapt(
+        Adaptive=LoggingAdaptive,
+        minimum=adaptive_config.minimum,
+        maximum=adaptive_config.maximum,
+        target_duration=adaptive_config.target_duration,
+        interval=adaptive_config.interval,
+        wait_count=adaptive_config.wait_count,
+    )
+    return adaptive
@@ -0,0 +1,36 @@
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from cybulde.utils.io_utils import get_local_copy
+
+ARROW_IPC_CACHE_DIR = "/tmp/arrow_ipc_cache/"
+
+
+def load_arrow_ipc(
+    path: str, columns: Optional[list[str]] = None, local_cache_dir: str = ARROW_IPC_CACHE_DIR
+) -> pa.Table:
+    """
+    Memory-map an uncompressed Arrow IPC (Feather v2) file, as written by DatasetWriter with write_arrow_ipc.
+    The returned table points into the mapped file, so nothing is copied and the page cache is shared
+    between processes.
+    """
+    local_path = get_local_copy(path, local_cache_dir)
+    with pa.memory_map(local_path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table
+
+
+def load_arrow_ipc_as_pandas(
+    path: str, columns: Optional[list[str]] = None, local_cache_dir: str = ARROW_IPC_CACHE_DIR
+) -> pd.DataFrame:
+    """
+    Same as load_arrow_ipc, but as a data frame with ArrowDtype columns backed by the mapped buffers
+    instead of Python string objects
+    """
+    table = load_arrow_ipc(path, columns, local_cache_dir)
+    df: pd.DataFrame = table.to_pandas(types_mapper=pd.ArrowDtype)
+    return df
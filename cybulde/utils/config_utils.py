@@ -6,7 +6,7 @@
 import pickle
 
 from dataclasses import asdict
-from functools import partial
+from functools import partial, wraps
 from io import BytesIO, StringIO
 from typing import Any, Optional
 
@@ -17,7 +17,6 @@
 from hydra.types import TaskFunction
 from omegaconf import DictConfig, OmegaConf
 
-from cybulde.config_schemas import data_processing_config_schema, tokenizer_training_config_schema
 from cybulde.utils.io_utils import open_file
 
 
@@ -37,11 +36,13 @@ def decorated_main(dict_config: Optional[DictConfig] = None) -> Any:
 
 
 def get_pickle_config(config_path: str, config_name: str) -> Any:
-    setup_config()
-    setup_logger()
-
+    # The pickled config is already composed, so the schemas don't have to be registered, and nothing
+    # is set up when the entry point module is only imported (e.g. by dask workers unpickling its functions)
     def main_decorator(task_function: TaskFunction) -> Any:
+        # The undecorated task is kept as __wrapped__, to call it with an already built config
+        @wraps(task_function)
         def decorated_main() -> None:
+            setup_logger()
             config = load_pickle_config(config_path, config_name)
             task_function(config)
 
@@ -57,8 +58,18 @@ def load_pickle_config(config_path: str, config_name: str) -> Any:
 
 
 def setup_config() -> None:
+    # Imported here, as only composing a config needs the schemas registered
+    from cybulde.config_schemas import (
+        data_processing_config_schema,
+        tokenize_data_config_schema,
+        tokenizer_sweep_config_schema,
+        tokenizer_training_config_schema,
+    )
+
     data_processing_config_schema.setup_config()
     tokenizer_training_config_schema.setup_config()
+    tokenizer_sweep_config_schema.setup_config()
+    tokenize_data_config_schema.setup_config()
     # def main_decorator(task_function: TaskFunction)-> Any:
     #    def decorated_main() -> None:
     #        config = load_pickle_config(config_path, config_name)
@@ -107,7 +118,10 @@ def save_config_as_pickle(config: Any, save_path: str) -> None:
         f.write(bytes_io.getvalue())
 
 
-def custom_instantiate(config: Any) -> Any:
+def custom_instantiate(config: Any, exclude_keys: Optional[list[str]] = None) -> Any:
+    """
+    Instantiate _target_ with the fields of config, except exclude_keys (fields which aren't arguments of _target_)
+    """
     config_as_dict = asdict(config)
     if "_target_" not in config_as_dict:
         raise ValueError("Config does not have key _target_")
@@ -117,6 +131,8 @@ def custom_instantiate(config: Any) -> Any:
 
     config_as_dict.pop("_target_", None)
     config_as_dict.pop("_partial_", None)
+    for key in exclude_keys or []:
+        config_as_dict.pop(key, None)
     splitted_target = _target_ = _target_.split(".")
     module_name, class_name = ".".join(splitted_target[:-1]), splitted_target[-1]
     module = importlib.import_module(module_name)
@@ -0,0 +1,113 @@
+import json
+import os
+import time
+
+from contextlib import contextmanager
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Iterator
+
+from cybulde.config_schemas.dask_cluster.dask_cluster_schema import DaskClusterConfig
+from cybulde.utils.config_utils import custom_instantiate
+from cybulde.utils.io_utils import copy_file, make_dirs, open_file
+from cybulde.utils.utils import get_logger
+
+PERFORMANCE_REPORT_FILE_NAME = "dask_performance_report.html"
+TASK_STREAM_FILE_NAME = "dask_task_stream.json"
+WORKER_PROFILE_FILE_NAME = "dask_worker_profile.json"
+
+# Fields of DaskClusterConfig which set how the cluster is used, not arguments of the cluster class
+CLUSTER_USAGE_KEYS = ["scheduler_address", "adaptive"]
+
+
+def write_json_file(json_file_path: str, json_file_content: Any) -> None:
+    # Anything json doesn't know is written as its string
+    with open_file(json_file_path, "w") as json_file:
+        json.dump(json_file_content, json_file, default=str)
+
+
+@contextmanager
+def save_dask_diagnostics(client: Any, save_dir: str) -> Iterator[None]:
+    """
+    Record what the cluster does inside the context, and save it to save_dir, also when the context fails:
+    - dask_performance_report.html: the dashboard plots (task stream, worker profile, bandwidth) of the run
+    - dask_task_stream.json: start and stop times, worker and thread of every task, to find stragglers
+    - dask_worker_profile.json: the sampled call stacks of the worker threads, to find hot (or GIL bound) code
+    The cluster is usually closed right after the run, so these are all that is left to look at.
+    """
+    from dask.distributed import get_task_stream, performance_report
+
+    logger = get_logger(Path(__file__).name)
+    start_time = time.time()
+    with TemporaryDirectory() as tmp_dir_name:
+        performance_report_path = os.path.join(tmp_dir_name, PERFORMANCE_REPORT_FILE_NAME)
+        report = performance_report(filename=performance_report_path)  # type: ignore[no-untyped-call]
+        task_stream_recorder = get_task_stream(client=client)  # type: ignore[no-untyped-call]
+        try:
+            with report, task_stream_recorder as task_stream:
+                yield
+        finally:
+            make_dirs(save_dir)
+            logger.info(f"Saving the dask performance report, task stream and worker profile to {save_dir}...")
+            # Missing if building the report failed, the other files can still be saved
+            if os.path.isfile(performance_report_path):
+                copy_file(performance_report_path, os.path.join(save_dir, PERFORMANCE_REPORT_FILE_NAME))
+            # "type" is the pickled result type, "typename" is its readable name
+            tasks = [{name: value for name, value in task.items() if name != "type"} for task in task_stream.data]
+            write_json_file(os.path.join(save_dir, TASK_STREAM_FILE_NAME), tasks)
+            write_json_file(os.path.join(save_dir, WORKER_PROFILE_FILE_NAME), client.profile(start=start_time))
+
+
+def create_dask_cluster(dask_cluster_config: DaskClusterConfig) -> Any:
+    cluster = custom_instantiate(dask_cluster_config, exclude_keys=CLUSTER_USAGE_KEYS)
+    if dask_cluster_config.adaptive.maximum is not None:
+        # Only needed to scale adaptively
+        from cybulde.utils.adaptive_utils import adapt_cluster
+
+        adapt_cluster(cluster, dask_cluster_config.adaptive)
+    return cluster
+
+
+def get_nrof_workers(dask_cluster_config: DaskClusterConfig) -> int:
+    """
+    Number of workers to size the partitions for, the maximum with adaptive scaling, so that there are
+    enough cleaning tasks queued for the cluster to scale up to it
+    """
+    if dask_cluster_config.adaptive.maximum is not None:
+        return dask_cluster_config.adaptive.maximum
+    return dask_cluster_config.n_workers
+
+
+@contextmanager
+def get_dask_client(dask_cluster_config: DaskClusterConfig) -> Iterator[Any]:
+    """
+    Client of the scheduler at dask_cluster_config.scheduler_address, which is left running on exit, or else of
+    a new cluster created from dask_cluster_config, which is closed on exit
+    """
+    from dask.distributed import Client
+
+    logger = get_logger(Path(__file__).name)
+    if dask_cluster_config.scheduler_address is not None:
+        logger.info(f"Attaching to the dask scheduler at {dask_cluster_config.scheduler_address}...")
+        if dask_cluster_config.adaptive.maximum is not None:
+            logger.warning(
+                "dask_cluster.adaptive is ignored when attaching to a running scheduler, "
+                "the cluster scales as configured when it was started"
+            )
+        client = Client(dask_cluster_config.scheduler_address)  # type: ignore[no-untyped-call]
+        try:
+            yield client
+        finally:
+            logger.info("closing dask client, the cluster is left running...")
+            client.close()  # type: ignore[no-untyped-call]
+        return
+
+    logger.info(f"Creating a {dask_cluster_config._target_}...")
+    cluster = create_dask_cluster(dask_cluster_config)
+    client = Client(cluster)  # type: ignore[no-untyped-call]
+    try:
+        yield client
+    finally:
+        logger.info("closing dask client and cluster...")
+        client.close()  # type: ignore[no-untyped-call]
+        cluster.close()
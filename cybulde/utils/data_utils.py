@@ -1,13 +1,35 @@
+import os
+
 from shutil import rmtree
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Iterator, Optional
 
-import dask.dataframe as dd
+import numpy as np
 import pandas as pd
 import psutil
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from fsspec.core import url_to_fs
 
 from cybulde.utils.gcp_utils import access_secret_version
+from cybulde.utils.tracing_utils import span
 from cybulde.utils.utils import run_shell_command
 
+if TYPE_CHECKING:
+    import dask.dataframe as dd
+
+# Runs of characters that `str.split()` does not treat as whitespace, so that counting matches with this
+# pattern gives the same result as `len(text.split())`
+WORD_PATTERN = (
+    r"[^\t\n\x0b\x0c\r\x1c-\x1f \x{85}\x{a0}\x{1680}\x{2000}-\x{200a}\x{2028}\x{2029}\x{202f}\x{205f}\x{3000}]+"
+)
+
+# Defaults of repartition_dataframe
+MIN_PARTITION_SIZE = 15 * (1024**2)
+AIMED_NROF_PARTITIONS_PER_WORKER = 10
+
 
 def get_cmd_to_get_raw_data(
     version: str,
@@ -95,17 +117,17 @@ def get_nrof_partitions(
 
 
 def repartition_dataframe(
-    df: dd.core.DataFrame,
+    df: "dd.core.DataFrame",
     nrof_workers: int,
     available_memory: Optional[float] = None,
-    min_partition_size: int = 15 * (1024**2),
-    aimed_nrof_partitions_per_worker: int = 10,
-) -> dd.core.DataFrame:
+    min_partition_size: int = MIN_PARTITION_SIZE,
+    aimed_nrof_partitions_per_worker: int = AIMED_NROF_PARTITIONS_PER_WORKER,
+) -> "dd.core.DataFrame":
     df_memory_usage = df.memory_usage(deep=True).sum().compute()
     nrof_partitions = get_nrof_partitions(
         df_memory_usage, nrof_workers, available_memory, min_partition_size, aimed_nrof_partitions_per_worker
     )
-    partitioned_df: dd.core.DataFrame  = df.repartition(npartitions=1).repartition(npartitions=nrof_partitions) # type: ignore
+    partitioned_df: "dd.core.DataFrame"  = df.repartition(npartitions=1).repartition(npartitions=nrof_partitions) # type: ignore
     return partitioned_df 
 
 
@@ -117,5 +139,222 @@ def get_repo_address_with_access_token(
     return f"https://{user_name}:{access_token}@{repo_address}"
 
 
+def add_text_statistics_columns(df: pd.DataFrame, text_column_name: str = "cleaned_text") -> pd.DataFrame:
+    """
+    Add nrof_words, nrof_chars and nrof_bytes columns computed from text_column_name.
+    These columns are written together with the processed data, so that length based filters and
+    downstream jobs don't need to recompute them.
+    """
+    with span("text_statistics_partition", nrof_rows=len(df)):
+        text_array = pa.array(df[text_column_name], type=pa.large_string(), from_pandas=True)
+        return df.assign(
+            nrof_words=pc.count_substring_regex(text_array, WORD_PATTERN).fill_null(0).to_numpy(),
+            nrof_chars=pc.utf8_length(text_array).fill_null(0).to_numpy(),
+            nrof_bytes=pc.binary_length(text_array).fill_null(0).to_numpy(),
+        )
+
+
+def shuffle_with_hash_key(df: pd.DataFrame, seed: int) -> pd.DataFrame:
+    """
+    Deterministically shuffle the rows by sorting them on a seeded hash of their content.
+    Unlike a random permutation, the position of a row doesn't depend on the other rows.
+    """
+    hash_key = f"{seed:016d}"[-16:]
+    row_hashes = pd.util.hash_pandas_object(df, index=False, hash_key=hash_key).to_numpy()
+    shuffled_df: pd.DataFrame = df.iloc[np.argsort(row_hashes, kind="stable")]
+    return shuffled_df
+
+
+def get_sample_hashes(texts: pd.Series, seed: int) -> pd.Series:
+    """
+    Seeded hash of every text, which only depends on the text, to sample the same rows whatever the partitioning
+    """
+    hash_key = f"{seed:016d}"[-16:]
+    sample_hashes: pd.Series = pd.util.hash_pandas_object(texts, index=False, hash_key=hash_key)
+    return sample_hashes
+
+
+def sample_rows(df: pd.DataFrame, text_column_name: str, sample_fraction: float, seed: int) -> pd.DataFrame:
+    """
+    Keep the rows whose sample hash is in the first sample_fraction of the hash range. Every row is kept with the
+    same probability, so the label proportions are preserved, and a row is kept or not independently of the others.
+    """
+    sampled_df: pd.DataFrame = df[get_sample_hashes(df[text_column_name], seed) < sample_fraction * 2**64]
+    return sampled_df
+
+
 def filter_based_on_minimum_number_of_words(df: pd.DataFrame, min_nrof_words: int) -> pd.DataFrame:
-    return df[df["cleaned_text"].str.split().apply(len) >= min_nrof_words]
+    return df[df["nrof_words"] >= min_nrof_words]
+
+
+def get_parquet_file_paths(path: str) -> list[str]:
+    """
+    The given parquet file, or the parquet shards in a directory written by DatasetWriter with nrof_shards
+    """
+    file_system, fs_path = url_to_fs(path)
+    if not file_system.isdir(fs_path):
+        return [path]
+    # Shard directories may also hold .arrow copies and the manifest, so only pick up the parquet files
+    return [file_system.unstrip_protocol(p) for p in sorted(file_system.glob(os.path.join(fs_path, "*.parquet")))]
+
+
+def get_parquet_dataset(path: str) -> ds.Dataset:
+    """
+    A lazily read parquet dataset over the files returned by get_parquet_file_paths
+    """
+    file_system, _ = url_to_fs(path)
+    fs_paths = [url_to_fs(file_path)[1] for file_path in get_parquet_file_paths(path)]
+    return ds.dataset(fs_paths, format="parquet", filesystem=file_system)
+
+
+def get_parquet_files_fingerprint(path: str) -> list[dict[str, Any]]:
+    """
+    Cheap identity of the parquet files under path: size, content hash of the object store
+    (the fsspec checksum if there is none) and the row group layout from the parquet footer
+    """
+    file_fingerprints = []
+    for file_path in get_parquet_file_paths(path):
+        file_system, fs_path = url_to_fs(file_path)
+        file_info = file_system.info(fs_path)
+        content_hash = file_info.get("md5Hash") or file_info.get("crc32c") or str(file_system.checksum(fs_path))
+        with file_system.open(fs_path, "rb") as f:
+            metadata = pq.read_metadata(f)
+        file_fingerprints.append(
+            {
+                "path": file_path,
+                "nrof_bytes": file_info["size"],
+                "content_hash": content_hash,
+                "nrof_rows": metadata.num_rows,
+                "row_groups": [
+                    [metadata.row_group(idx).num_rows, metadata.row_group(idx).total_byte_size]
+                    for idx in range(metadata.num_row_groups)
+                ],
+            }
+        )
+    return file_fingerprints
+
+
+def iter_text_batches(dataset: ds.Dataset, text_column_name: str, batch_size: int) -> Iterator[list[str]]:
+    """
+    Stream a single text column in batches of at most batch_size strings,
+    so that only a few row groups of that column are in memory at a time
+    """
+    for record_batch in dataset.to_batches(columns=[text_column_name], batch_size=batch_size):
+        texts: list[str] = record_batch.column(0).to_pylist()
+        yield texts
+
+
+class BottomKReservoir:
+    """
+    Keeps the texts with the smallest random keys seen so far. Taking the rows with the k smallest
+    keys is a uniform sample without replacement, and it only needs a single pass over the data.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.keys: np.ndarray = np.empty(0, dtype=np.float64)
+        self.texts = pa.array([], type=pa.large_string())
+        self.threshold = np.inf if capacity > 0 else -np.inf
+
+    def add(self, keys: np.ndarray, texts: pa.Array) -> None:
+        # Once the reservoir is full, rows with a key above its largest key can never get in
+        is_candidate = keys < self.threshold
+        if not is_candidate.any():
+            return
+        self.keys = np.concatenate([self.keys, keys[is_candidate]])
+        self.texts = pa.concat_arrays([self.texts, texts.filter(pa.array(is_candidate)).cast(pa.large_string())])
+        # Compacting only when twice the capacity is buffered keeps the cost linear in the number of rows
+        if len(self.keys) >= 2 * self.capacity:
+            self.compact()
+
+    def compact(self) -> None:
+        if len(self.keys) > self.capacity:
+            kept_indices = np.argpartition(self.keys, self.capacity - 1)[: self.capacity]
+            self.keys = self.keys[kept_indices]
+            self.texts = self.texts.take(pa.array(kept_indices))
+            self.threshold = self.keys.max()
+
+    def get_sorted_texts(self) -> list[str]:
+        self.compact()
+        sorted_texts: list[str] = self.texts.take(pa.array(np.argsort(self.keys, kind="stable"))).to_pylist()
+        return sorted_texts
+
+
+def get_proportional_allocations(nrof_rows_per_stratum: dict[Any, int], nrof_samples: int) -> dict[Any, int]:
+    """
+    Split nrof_samples over the strata in proportion to their number of rows, with largest remainder rounding
+    """
+    nrof_rows = sum(nrof_rows_per_stratum.values())
+    nrof_samples = min(nrof_samples, nrof_rows)
+    quotas = {stratum: nrof_samples * count / nrof_rows for stratum, count in nrof_rows_per_stratum.items()}
+    allocations = {stratum: int(quota) for stratum, quota in quotas.items()}
+    nrof_remaining_samples = nrof_samples - sum(allocations.values())
+    strata_by_remainder = sorted(quotas, key=lambda stratum: quotas[stratum] - allocations[stratum], reverse=True)
+    for stratum in strata_by_remainder[:nrof_remaining_samples]:
+        allocations[stratum] += 1
+    return allocations
+
+
+def reservoir_sample_texts(
+    dataset: ds.Dataset,
+    text_column_name: str,
+    nrof_samples: Optional[int],
+    sample_fraction: Optional[float],
+    nrof_holdout_samples: int,
+    seed: int,
+    batch_size: int,
+    stratify_column_name: Optional[str] = None,
+) -> tuple[list[str], list[str]]:
+    """
+    Seeded single-pass sample of nrof_samples (or sample_fraction of the) texts, and a disjoint holdout sample
+    of nrof_holdout_samples texts taken from the next smallest keys.
+    With stratify_column_name every stratum is sampled separately, in proportion to its number of rows.
+    Returns the sampled and the holdout texts.
+    """
+    if (nrof_samples is None) == (sample_fraction is None):
+        raise ValueError("Exactly one of nrof_samples and sample_fraction has to be set")
+    if sample_fraction is not None and not 0 < sample_fraction <= 1:
+        raise ValueError(f"sample_fraction must be in (0, 1], got: {sample_fraction}")
+
+    if stratify_column_name is None:
+        nrof_rows_per_stratum = {None: dataset.count_rows()}
+    else:
+        # Only reads the (small, dictionary encoded) stratify column
+        stratum_counts = pc.value_counts(dataset.to_table(columns=[stratify_column_name]).column(0))
+        nrof_rows_per_stratum = {
+            stratum_count["values"]: stratum_count["counts"] for stratum_count in stratum_counts.to_pylist()
+        }
+
+    nrof_rows = sum(nrof_rows_per_stratum.values())
+    if nrof_samples is None:
+        nrof_samples = round(sample_fraction * nrof_rows)
+    sample_allocations = get_proportional_allocations(nrof_rows_per_stratum, nrof_samples)
+    holdout_allocations = get_proportional_allocations(
+        nrof_rows_per_stratum, min(nrof_holdout_samples, nrof_rows - sum(sample_allocations.values()))
+    )
+    reservoirs = {
+        stratum: BottomKReservoir(sample_allocations[stratum] + holdout_allocations[stratum])
+        for stratum in nrof_rows_per_stratum
+    }
+
+    rng = np.random.default_rng(seed)
+    columns = [text_column_name] if stratify_column_name is None else [text_column_name, stratify_column_name]
+    for record_batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+        # Keys are drawn in row order, so the sample doesn't depend on batch_size
+        keys = rng.random(record_batch.num_rows)
+        texts = record_batch.column(text_column_name)
+        if stratify_column_name is None:
+            reservoirs[None].add(keys, texts)
+            continue
+        strata = record_batch.column(stratify_column_name)
+        for stratum, reservoir in reservoirs.items():
+            is_in_stratum = pc.equal(strata, stratum).fill_null(False).to_numpy(zero_copy_only=False)
+            reservoir.add(keys[is_in_stratum], texts.filter(pa.array(is_in_stratum)))
+
+    sampled_texts: list[str] = []
+    holdout_texts: list[str] = []
+    for stratum, reservoir in reservoirs.items():
+        stratum_texts = reservoir.get_sorted_texts()
+        sampled_texts.extend(stratum_texts[: sample_allocations[stratum]])
+        holdout_texts.extend(stratum_texts[sample_allocations[stratum] :])
+    return sampled_texts, holdout_texts
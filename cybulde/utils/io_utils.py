@@ -1,24 +1,34 @@
+import glob
+import hashlib
 import os
+import shutil
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
 from typing import Any
 
 import yaml
 
 from fsspec import AbstractFileSystem, filesystem
+from fsspec.utils import get_protocol
 
 GCS_PREFIX = "gs://"
 GCS_FILE_SYSTEM_NAME = "gcs"
 LOCAL_FILE_SYSTEM_NAME = "file"
 TMP_FILE_PATH = "/tmp/"
+COPY_CHUNK_SIZE = 16 * 1024**2
 
 
 def choose_file_system(path: str) -> AbstractFileSystem:
-    return filesystem(GCS_FILE_SYSTEM_NAME) if path.startswith(GCS_PREFIX) else filesystem(LOCAL_FILE_SYSTEM_NAME)
+    # Other fsspec protocols (e.g. memory://) can stand in for GCS in benchmarks
+    protocol = GCS_FILE_SYSTEM_NAME if path.startswith(GCS_PREFIX) else get_protocol(path)
+    # fsspec caches the instances, and doesn't share them with forked processes
+    return filesystem(protocol)
 
 
-def open_file(path: str, mode: str = "r") -> Any:
+def open_file(path: str, mode: str = "r", **kwargs: Any) -> Any:
     file_system = choose_file_system(path)
-    return file_system.open(path, mode)
+    return file_system.open(path, mode, **kwargs)
 
 
 def write_yaml_file(yaml_file_path: str, yaml_file_content: dict[Any, Any]) -> None:
@@ -38,6 +48,12 @@ def is_file(path: str) -> bool:
     return is_a_file
 
 
+def get_file_size(path: str) -> int:
+    file_system = choose_file_system(path)
+    file_size: int = file_system.size(path)
+    return file_size
+
+
 def make_dirs(path: str) -> None:
     file_system = choose_file_system(path)
     file_system.makedirs(path, exist_ok=True)
@@ -54,15 +70,63 @@ def list_paths(path: str) -> list[str]:
     return paths
 
 
-def copy_dir(source_dir: str, target_dir: str) -> None:
+def copy_file(source_file: str, target_file: str) -> None:
+    source_file_system = choose_file_system(source_file)
+    if source_file_system is choose_file_system(target_file):
+        # Server side copy on object stores (a rewrite on GCS), the content doesn't pass through this machine
+        source_file_system.copy(source_file, target_file)
+        return
+    with open_file(source_file, mode="rb") as source, open_file(target_file, mode="wb") as target:
+        shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+
+
+def copy_dir(source_dir: str, target_dir: str, max_workers: int = 8) -> None:
     if not is_dir(target_dir):
         make_dirs(target_dir)
-    source_files = list_paths(source_dir)
-    for source_file in source_files:
-        target_file = os.path.join(target_dir, os.path.basename(source_file))
-        if is_file(source_file):
-            with open_file(source_file, mode="rb") as source, open_file(target_file, mode="wb") as target:
-                content = source.read()
-                target.write(content)
-        else:
-            raise ValueError(f"Source file: '{source_file}' is not a file.")
+    source_file_infos = choose_file_system(source_dir).ls(source_dir, detail=True)
+    for source_file_info in source_file_infos:
+        if source_file_info["type"] != "file":
+            raise ValueError(f"Source file: '{source_file_info['name']}' is not a file.")
+
+    file_names = [os.path.basename(source_file_info["name"].rstrip("/")) for source_file_info in source_file_infos]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(copy_file, os.path.join(source_dir, file_name), os.path.join(target_dir, file_name))
+            for file_name in file_names
+        ]
+        for future in futures:
+            future.result()
+
+
+def get_local_copy(path: str, local_cache_dir: str) -> str:
+    """
+    Local path of the given file, remote files are downloaded once to local_cache_dir and reused
+    by every later call (and process) on the same node, e.g. to memory-map them, until the remote file changes
+    """
+    if get_protocol(path) == LOCAL_FILE_SYSTEM_NAME:
+        return path
+
+    file_system = choose_file_system(path)
+    file_info = file_system.info(path)
+    # The content hash of the object store (the fsspec checksum, which includes the mtime, if there is none),
+    # so that a file rewritten with the same size gets a new copy
+    content_hash = file_info.get("md5Hash") or file_info.get("crc32c") or str(file_system.checksum(path))
+    path_hash = hashlib.sha256(path.encode("utf-8")).hexdigest()[:16]
+    content_hash = hashlib.sha256(content_hash.encode("utf-8")).hexdigest()[:16]
+    local_file_name = f"{path_hash}-{content_hash}-{os.path.basename(path)}"
+    local_path = os.path.join(local_cache_dir, local_file_name)
+    if os.path.isfile(local_path) and os.path.getsize(local_path) == file_info["size"]:
+        return local_path
+
+    make_dirs(local_cache_dir)
+    # Download under a unique name and rename, so concurrent callers never see a partial file
+    tmp_local_path = f"{local_path}.{os.getpid()}.tmp"
+    file_system.get(path, tmp_local_path)
+    os.replace(tmp_local_path, local_path)
+    # Copies of earlier versions of the file, memory-mapped ones stay readable until they are closed
+    stale_file_pattern = f"{glob.escape(path_hash)}-*-{glob.escape(os.path.basename(path))}"
+    for stale_local_path in glob.glob(os.path.join(glob.escape(local_cache_dir), stale_file_pattern)):
+        if stale_local_path != local_path:
+            with suppress(FileNotFoundError):
+                os.remove(stale_local_path)
+    return local_path
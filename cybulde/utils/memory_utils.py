@@ -0,0 +1,232 @@
+import os
+import socket
+import threading
+import tracemalloc
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import pandas as pd
+import psutil
+
+from cybulde.utils.io_utils import write_yaml_file
+from cybulde.utils.utils import get_logger
+
+
+class MemoryMonitor(threading.Thread):
+    """
+    Samples the RSS of this process every interval_seconds, and keeps its peak per stage and per running partition.
+    The peak of the Python allocations (tracemalloc) is kept per stage, tracemalloc slows Python code down,
+    so it is only meant for diagnostic runs.
+    """
+
+    def __init__(self, interval_seconds: float) -> None:
+        super().__init__(name="memory-monitor", daemon=True)
+        self.interval_seconds = interval_seconds
+        self.process = psutil.Process()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.peak_rss_bytes = 0
+        self.stage_name: Optional[str] = None
+        self.stages: dict[str, dict[str, int]] = {}
+        self.running_partitions: list[dict[str, int]] = []
+        self.partitions: list[dict[str, int]] = []
+        self.started_tracemalloc = not tracemalloc.is_tracing()
+        if self.started_tracemalloc:
+            tracemalloc.start()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval_seconds):
+            self.sample()
+
+    def sample(self) -> int:
+        rss_bytes: int = self.process.memory_info().rss
+        with self.lock:
+            self.peak_rss_bytes = max(self.peak_rss_bytes, rss_bytes)
+            if self.stage_name is not None:
+                stage = self.stages[self.stage_name]
+                stage["peak_rss_bytes"] = max(stage["peak_rss_bytes"], rss_bytes)
+            for partition in self.running_partitions:
+                partition["peak_rss_bytes"] = max(partition["peak_rss_bytes"], rss_bytes)
+        return rss_bytes
+
+    def set_stage(self, stage_name: Optional[str]) -> None:
+        """
+        Close the current stage and start stage_name, None to not account the following samples to any stage
+        """
+        self.sample()
+        with self.lock:
+            if self.stage_name is not None:
+                stage = self.stages[self.stage_name]
+                stage["peak_python_bytes"] = max(stage["peak_python_bytes"], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self.stage_name = stage_name
+            if stage_name is not None:
+                self.stages.setdefault(stage_name, {"peak_rss_bytes": 0, "peak_python_bytes": 0})
+        self.sample()
+
+    @contextmanager
+    def partition(self, df: pd.DataFrame) -> Iterator[None]:
+        """
+        Track the peak RSS while processing df. Partitions running at the same time in other threads of the
+        process count towards each other's peak, so this is an upper bound with worker threads.
+        """
+        partition = {"nrof_rows": len(df), "nrof_bytes": int(df.memory_usage(deep=True).sum()), "peak_rss_bytes": 0}
+        with self.lock:
+            self.running_partitions.append(partition)
+        self.sample()
+        try:
+            yield
+        finally:
+            self.sample()
+            with self.lock:
+                self.running_partitions.remove(partition)
+                self.partitions.append(partition)
+
+    def stop(self) -> dict[str, Any]:
+        self.set_stage(None)
+        self.stopped.set()
+        self.join()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+        return {
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "stages": self.stages,
+            "partitions": self.partitions,
+        }
+
+
+# The memory monitor of this process, None while memory isn't monitored
+_monitor: Optional[MemoryMonitor] = None
+
+
+def start_memory_monitor(interval_seconds: float) -> None:
+    """
+    Start monitoring the memory of this process, a no-op if it already is (e.g. dask worker threads
+    which run in the process which started monitoring)
+    """
+    global _monitor
+    if _monitor is None:
+        _monitor = MemoryMonitor(interval_seconds)
+        _monitor.start()
+
+
+def stop_memory_monitor() -> Optional[dict[str, Any]]:
+    """
+    Stop monitoring the memory of this process and return its peaks, None if it wasn't monitored
+    """
+    global _monitor
+    monitor, _monitor = _monitor, None
+    return None if monitor is None else monitor.stop()
+
+
+def set_memory_stage(stage_name: Optional[str]) -> None:
+    monitor = _monitor
+    if monitor is not None:
+        monitor.set_stage(stage_name)
+
+
+@contextmanager
+def memory_stage(stage_name: str, client: Optional[Any] = None) -> Iterator[None]:
+    """
+    Account the peak memory of this process, and of the workers of the given dask client, to stage_name
+    """
+    if _monitor is None:
+        yield
+        return
+
+    set_memory_stage(stage_name)
+    if client is not None:
+        client.run(set_memory_stage, stage_name)
+    try:
+        yield
+    finally:
+        set_memory_stage(None)
+        if client is not None:
+            client.run(set_memory_stage, None)
+
+
+@contextmanager
+def partition_memory(df: pd.DataFrame) -> Iterator[None]:
+    """
+    Track the size and the peak memory of a partition processed on this worker, a no-op without monitoring
+    """
+    monitor = _monitor
+    if monitor is None:
+        yield
+        return
+
+    with monitor.partition(df):
+        yield
+
+
+def get_memory_report(
+    driver_memory: dict[str, Any], worker_memory: list[dict[str, Any]], worker_memory_limits: list[int]
+) -> dict[str, Any]:
+    """
+    Per stage peaks of the driver and the workers, and the largest partitions, to size machines and partitions.
+    With worker threads the workers run in the driver process, so their peaks are the ones of the driver.
+    """
+    stage_names = list(driver_memory["stages"])
+    for memory in worker_memory:
+        stage_names.extend(stage_name for stage_name in memory["stages"] if stage_name not in stage_names)
+
+    stages = {}
+    for stage_name in stage_names:
+        driver_stage = driver_memory["stages"].get(stage_name, {"peak_rss_bytes": 0, "peak_python_bytes": 0})
+        worker_stages = [memory["stages"][stage_name] for memory in worker_memory if stage_name in memory["stages"]]
+        stages[stage_name] = {
+            "driver_peak_rss_bytes": driver_stage["peak_rss_bytes"],
+            "driver_peak_python_bytes": driver_stage["peak_python_bytes"],
+            "max_worker_peak_rss_bytes": max((stage["peak_rss_bytes"] for stage in worker_stages), default=None),
+            "max_worker_peak_python_bytes": max((stage["peak_python_bytes"] for stage in worker_stages), default=None),
+        }
+
+    partitions = [partition for memory in [driver_memory, *worker_memory] for partition in memory["partitions"]]
+    return {
+        "driver_peak_rss_bytes": driver_memory["peak_rss_bytes"],
+        "max_worker_peak_rss_bytes": max((memory["peak_rss_bytes"] for memory in worker_memory), default=None),
+        "min_worker_memory_limit_bytes": min(worker_memory_limits, default=None),
+        "stages": stages,
+        "partitions": {
+            "nrof_partitions": len(partitions),
+            "max_nrof_rows": max((partition["nrof_rows"] for partition in partitions), default=None),
+            "max_nrof_bytes": max((partition["nrof_bytes"] for partition in partitions), default=None),
+            "max_peak_rss_bytes": max((partition["peak_rss_bytes"] for partition in partitions), default=None),
+        },
+        "processes": [driver_memory, *worker_memory],
+    }
+
+
+@contextmanager
+def save_memory_report(report_file_path: str, interval_seconds: float, client: Optional[Any] = None) -> Iterator[None]:
+    """
+    Monitor the memory of this process, and of the workers of the given dask client, inside the context,
+    and write the memory report to report_file_path, also when the context fails.
+    Stages are marked with memory_stage and partitions with partition_memory.
+    """
+    logger = get_logger(Path(__file__).name)
+    start_memory_monitor(interval_seconds)
+    if client is not None:
+        client.run(start_memory_monitor, interval_seconds)
+    try:
+        yield
+    finally:
+        worker_memory = []
+        worker_memory_limits = []
+        if client is not None:
+            worker_memory_limits = [worker["memory_limit"] for worker in client.scheduler_info()["workers"].values()]
+            # With worker threads, the first worker returns the memory of this process and the others None
+            worker_memory = [memory for memory in client.run(stop_memory_monitor).values() if memory is not None]
+        driver_memory = stop_memory_monitor() or worker_memory.pop(0)
+
+        memory_report = get_memory_report(driver_memory, worker_memory, worker_memory_limits)
+        write_yaml_file(report_file_path, memory_report)
+        logger.info(
+            f"Wrote {report_file_path}, peak RSS of the driver: {memory_report['driver_peak_rss_bytes']}, "
+            f"of a worker: {memory_report['max_worker_peak_rss_bytes']}, "
+            f"largest partition: {memory_report['partitions']['max_nrof_bytes']} bytes"
+        )
@@ -0,0 +1,151 @@
+import os
+import sys
+import threading
+
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+from typing import Any, Iterator, Optional
+
+from cybulde.utils.io_utils import open_file
+from cybulde.utils.utils import get_logger
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the call stack of the thread which enters it every interval_seconds, from root_frame down,
+    and counts the samples per stack. The sampled thread isn't interrupted, only the sampling thread competes
+    with it for the GIL, which is the same approach as the dask worker profiler.
+    """
+
+    def __init__(self, interval_seconds: float, root_frame: FrameType) -> None:
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval_seconds = interval_seconds
+        self.root_frame = root_frame
+        self.stopped = threading.Event()
+        self.stack_counts: Counter[str] = Counter()
+
+    def __enter__(self) -> "StackSampler":
+        self.thread_id = threading.get_ident()
+        self.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.stopped.set()
+        self.join()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval_seconds):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stack_counts[self.get_collapsed_stack(frame)] += 1
+
+    def get_collapsed_stack(self, frame: Optional[FrameType]) -> str:
+        """
+        Function names of the stack from the root frame to frame, separated by ";"
+        """
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            if frame is self.root_frame:
+                break
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+class PartitionProfiler:
+    def __init__(self, partition_fraction: float, interval_seconds: float) -> None:
+        self.partition_fraction = partition_fraction
+        self.interval_seconds = interval_seconds
+        self.lock = threading.Lock()
+        self.stack_counts: Counter[str] = Counter()
+        self.nrof_profiled_partitions = 0
+
+    def is_profiled(self, partition_number: int) -> bool:
+        # Evenly spread over the partitions and the same in every run, e.g. every 10th one for 0.1
+        return int(partition_number * self.partition_fraction) != int((partition_number + 1) * self.partition_fraction)
+
+    def add_stack_counts(self, stack_counts: Counter[str]) -> None:
+        with self.lock:
+            self.stack_counts.update(stack_counts)
+            self.nrof_profiled_partitions += 1
+
+
+# The partition profiler of this process, None while partitions aren't profiled
+_profiler: Optional[PartitionProfiler] = None
+
+
+def start_partition_profiling(partition_fraction: float, interval_seconds: float) -> None:
+    """
+    Start profiling partition_fraction of the partitions processed in this process, a no-op if it already does
+    (e.g. dask worker threads which run in the process which started profiling)
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = PartitionProfiler(partition_fraction, interval_seconds)
+
+
+def stop_partition_profiling() -> Optional[tuple[Counter[str], int]]:
+    """
+    Stop profiling and return the sample counts per stack and the number of profiled partitions,
+    None if this process didn't profile
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return None if profiler is None else (profiler.stack_counts, profiler.nrof_profiled_partitions)
+
+
+@contextmanager
+def profile_partition(partition_info: Optional[dict[str, Any]]) -> Iterator[None]:
+    """
+    Sample the stacks of the enclosed code if the partition is one of the profiled ones. partition_info is the
+    argument dask passes to map_partitions functions which accept it, it is None when dask builds the meta.
+    """
+    profiler = _profiler
+    if profiler is None or partition_info is None or not profiler.is_profiled(partition_info["number"]):
+        yield
+        return
+
+    # The frame of the with statement, above this generator and the __enter__ of contextmanager
+    with StackSampler(profiler.interval_seconds, sys._getframe(2)) as sampler:
+        yield
+    profiler.add_stack_counts(sampler.stack_counts)
+
+
+@contextmanager
+def save_partition_profile(
+    profile_file_path: str, partition_fraction: float, interval_seconds: float, client: Optional[Any] = None
+) -> Iterator[None]:
+    """
+    Profile a sample of the partitions processed inside the context, in this process and on the workers of the
+    given dask client, and write the merged stacks to profile_file_path in the collapsed stack format:
+    one "frame;frame;frame count" line per stack, which flamegraph.pl and speedscope.app can open.
+    """
+    logger = get_logger(Path(__file__).name)
+    start_partition_profiling(partition_fraction, interval_seconds)
+    if client is not None:
+        client.run(start_partition_profiling, partition_fraction, interval_seconds)
+    try:
+        yield
+    finally:
+        profiles = []
+        if client is not None:
+            # With worker threads, the first worker returns the profile of this process and the others None
+            profiles.extend(client.run(stop_partition_profiling).values())
+        profiles.append(stop_partition_profiling())
+
+        stack_counts: Counter[str] = Counter()
+        nrof_profiled_partitions = 0
+        for profile in profiles:
+            if profile is not None:
+                stack_counts.update(profile[0])
+                nrof_profiled_partitions += profile[1]
+
+        with open_file(profile_file_path, "w") as profile_file:
+            for stack, count in stack_counts.most_common():
+                profile_file.write(f"{stack} {count}\n")
+        logger.info(
+            f"Wrote {profile_file_path}: {sum(stack_counts.values())} samples of {nrof_profiled_partitions} partitions"
+        )
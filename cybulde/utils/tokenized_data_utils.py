@@ -0,0 +1,58 @@
+import os
+import shutil
+
+from typing import Any, cast
+
+import numpy as np
+
+from cybulde.utils.io_utils import get_local_copy
+
+TOKENIZED_DATA_CACHE_DIR = "/tmp/tokenized_data_cache/"
+TOKEN_IDS_FILE_SUFFIX = "_token_ids.npy"
+OFFSETS_FILE_SUFFIX = "_offsets.npy"
+LABELS_FILE_SUFFIX = "_labels.npy"
+METADATA_FILE_NAME = "tokenized_data_metadata.yaml"
+
+
+def get_token_id_dtype(vocab_size: int) -> Any:
+    return np.uint16 if vocab_size <= np.iinfo(np.uint16).max + 1 else np.uint32
+
+
+def write_npy_from_raw_file(raw_file_path: str, npy_file_path: str, dtype: Any) -> None:
+    """
+    Turn a file of raw dtype values, which can be appended to without knowing its final length,
+    into a .npy file by writing the header and streaming the values after it
+    """
+    # Only some numpy versions type the .npy format functions, so they are called untyped on all of them
+    npy_format = cast(Any, np.lib.format)
+    nrof_values = os.path.getsize(raw_file_path) // np.dtype(dtype).itemsize
+    descr = npy_format.dtype_to_descr(np.dtype(dtype))
+    header = {"descr": descr, "fortran_order": False, "shape": (nrof_values,)}
+    with open(npy_file_path, "wb") as npy_file, open(raw_file_path, "rb") as raw_file:
+        npy_format.write_array_header_1_0(npy_file, header)
+        shutil.copyfileobj(raw_file, npy_file, length=16 * 1024**2)
+
+
+class TokenizedSplit:
+    """
+    Memory-mapped token ids of a split written by tokenize_data.py. Sequence idx is
+    token_ids[offsets[idx] : offsets[idx + 1]], a view into the mapped file.
+    """
+
+    def __init__(
+        self, tokenized_data_dir: str, split_name: str, local_cache_dir: str = TOKENIZED_DATA_CACHE_DIR
+    ) -> None:
+        def load(file_suffix: str) -> np.ndarray:
+            local_path = get_local_copy(os.path.join(tokenized_data_dir, f"{split_name}{file_suffix}"), local_cache_dir)
+            array: np.ndarray = np.load(local_path, mmap_mode="r")
+            return array
+
+        self.token_ids = load(TOKEN_IDS_FILE_SUFFIX)
+        self.offsets = load(OFFSETS_FILE_SUFFIX)
+        self.labels = load(LABELS_FILE_SUFFIX)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __getitem__(self, idx: int) -> tuple[np.ndarray, int]:
+        return self.token_ids[self.offsets[idx] : self.offsets[idx + 1]], int(self.labels[idx])
@@ -0,0 +1,162 @@
+import json
+import os
+import socket
+import threading
+import time
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from cybulde.utils.io_utils import open_file, write_yaml_file
+from cybulde.utils.utils import get_logger
+
+
+class Tracer:
+    """
+    Collects the spans of one process as Chrome trace events, which Perfetto (ui.perfetto.dev) and
+    chrome://tracing can open. Span start times are wall clock times, so spans of different processes line up.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.events: list[dict[str, Any]] = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "args": {"name": f"{socket.gethostname()}:{os.getpid()}"},
+            }
+        ]
+
+    def add_span(self, name: str, start_ns: int, duration_ns: int, args: dict[str, Any]) -> None:
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": start_ns / 1e3,
+            "dur": duration_ns / 1e3,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self.lock:
+            self.events.append(event)
+
+
+class Span:
+    def __init__(self, tracer: Tracer, name: str, args: dict[str, Any]) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> "Span":
+        self.start_ns = time.time_ns()
+        self.start_counter_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.tracer.add_span(self.name, self.start_ns, time.perf_counter_ns() - self.start_counter_ns, self.args)
+
+
+class NoOpSpan:
+    def __enter__(self) -> "NoOpSpan":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+
+NO_OP_SPAN = NoOpSpan()
+
+# The tracer of this process, None while tracing is disabled
+_tracer: Optional[Tracer] = None
+
+
+def span(name: str, **args: Any) -> Any:
+    """
+    Time the enclosed block as a span named name, with args shown with the span in the trace viewer.
+    Without tracing this returns a shared no-op context manager, so spans can stay in per-partition code.
+    They are not meant for per-text code.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return NO_OP_SPAN
+    return Span(tracer, name, args)
+
+
+def start_tracing() -> None:
+    """
+    Start collecting the spans of this process, a no-op if it already does (e.g. dask worker threads
+    which run in the process which started tracing)
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+
+
+def stop_tracing() -> list[dict[str, Any]]:
+    """
+    Stop collecting spans and return the events collected in this process, empty if it didn't trace
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return [] if tracer is None else tracer.events
+
+
+def get_span_summary(events: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """
+    Count, total and maximum duration of the spans with the same name, the longest total first
+    """
+    durations: dict[str, list[float]] = {}
+    for event in events:
+        if event["ph"] == "X":
+            durations.setdefault(event["name"], []).append(event["dur"] / 1e6)
+
+    summary = {
+        name: {
+            "count": len(span_durations),
+            "total_seconds": round(sum(span_durations), 3),
+            "mean_seconds": round(sum(span_durations) / len(span_durations), 4),
+            "max_seconds": round(max(span_durations), 4),
+        }
+        for name, span_durations in durations.items()
+    }
+    return dict(sorted(summary.items(), key=lambda item: item[1]["total_seconds"], reverse=True))
+
+
+def format_span_summary(summary: dict[str, dict[str, Any]]) -> str:
+    lines = [f"{'span':<40} {'count':>8} {'total s':>10} {'mean s':>10} {'max s':>10}"]
+    for name, stats in summary.items():
+        lines.append(
+            f"{name:<40} {stats['count']:>8} {stats['total_seconds']:>10} "
+            f"{stats['mean_seconds']:>10} {stats['max_seconds']:>10}"
+        )
+    return "\n".join(lines)
+
+
+@contextmanager
+def trace_to_file(trace_file_path: str, summary_file_path: str, client: Optional[Any] = None) -> Iterator[None]:
+    """
+    Trace the enclosed block, in this process and on the workers of the given dask client, and write
+    the spans to trace_file_path (Chrome trace JSON) and their summary to summary_file_path, also when it fails.
+    Workers which join the cluster later aren't traced.
+    """
+    logger = get_logger(Path(__file__).name)
+    start_tracing()
+    if client is not None:
+        client.run(start_tracing)
+    try:
+        yield
+    finally:
+        events = []
+        if client is not None:
+            # With worker threads, the first worker returns the spans of this process and the others nothing
+            for worker_events in client.run(stop_tracing).values():
+                events.extend(worker_events)
+        events.extend(stop_tracing())
+
+        with open_file(trace_file_path, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+        summary = get_span_summary(events)
+        write_yaml_file(summary_file_path, summary)
+        logger.info(f"Wrote {trace_file_path}, spans:\n{format_span_summary(summary)}")
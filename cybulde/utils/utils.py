@@ -2,9 +2,11 @@
 import socket
 import subprocess
 
-import pkg_resources
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
 
-from symspellpy import SymSpell
+if TYPE_CHECKING:
+    from symspellpy import SymSpell
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -15,6 +17,26 @@ def run_shell_command(cmd: str) -> str:
     return subprocess.run(cmd, text=True, shell=True, check=True, capture_output=True).stdout
 
 
+@lru_cache(maxsize=None)
+def load_spell_correction_model(
+    max_dictionary_edit_distance: int, prefix_length: int, count_threshold: int
+) -> "SymSpell":
+    """
+    Load the symspell dictionaries once per process, so the workers of a long-lived cluster keep them between runs
+    """
+    # Imported here, so that only the processes which build or unpickle a model pay for the import
+    import pkg_resources
+
+    from symspellpy import SymSpell
+
+    model = SymSpell(max_dictionary_edit_distance, prefix_length, count_threshold)
+    dictionary_path = pkg_resources.resource_filename("symspellpy", "frequency_dictionary_en_82_765.txt")
+    bigram_dictionary_path = pkg_resources.resource_filename("symspellpy", "frequency_bigramdictionary_en_243_342.txt")
+    model.load_dictionary(dictionary_path, 0, 1)
+    model.load_bigram_dictionary(bigram_dictionary_path, 0, 2)
+    return model
+
+
 class SpellCorrectionModel:
     def __init__(
         self,
@@ -25,17 +47,19 @@ def __init__(
         self.max_dictionary_edit_distance = max_dictionary_edit_distance
         self.prefix_length = prefix_length
         self.count_threshold = count_threshold
-        self.model = self._initialize_model(prefix_length, count_threshold)
+        self.model = load_spell_correction_model(max_dictionary_edit_distance, prefix_length, count_threshold)
+
+    def __getstate__(self) -> dict[str, Any]:
+        # The dictionaries (~24MB pickled) aren't sent with the task graphs, the workers load them when unpickling
+        state = self.__dict__.copy()
+        del state["model"]
+        return state
 
-    def _initialize_model(self, prefix_length: int, count_threshold: int) -> SymSpell:
-        model = SymSpell(self.max_dictionary_edit_distance, prefix_length, count_threshold)
-        dictionary_path = pkg_resources.resource_filename("symspellpy", "frequency_dictionary_en_82_765.txt")
-        bigram_dictionary_path = pkg_resources.resource_filename(
-            "symspellpy", "frequency_bigramdictionary_en_243_342.txt"
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.model = load_spell_correction_model(
+            self.max_dictionary_edit_distance, self.prefix_length, self.count_threshold
         )
-        model.load_dictionary(dictionary_path, 0, 1)
-        model.load_bigram_dictionary(bigram_dictionary_path, 0, 2)
-        return model
 
     def __call__(self, text: str) -> str:
         suggestion: str = self.model.lookup_compound(text, max_edit_distance=self.max_dictionary_edit_distance)[0].term